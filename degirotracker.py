@@ -1,16 +1,92 @@
-from reciever import DegiroReciever
-from processor import DegiroProcessor
-from transactions import DegiroTransactions
-from dividend import DegiroDividend
-from graphs import DegiroGraphs
+from multiprocessing import freeze_support
+from argparse import ArgumentParser
+from datetime import datetime, timedelta
+from os import environ
+from functools import partial
+
+from pipeline import Pipeline, Stage
+from profiling import PROFILE_PATH, PROFILE_VARIABLE
+
+# The stages import their module when they run, so a run without changes does not load all libraries
+
+
+def receive():
+    from reciever import DegiroReciever
+    DegiroReciever().save_reports()
+
+
+def process(full_rebuild=False):
+    from processor import DegiroProcessor
+    DegiroProcessor().process_stats(full_rebuild=full_rebuild)
+
+
+def transactions():
+    from transactions import DegiroTransactions
+    DegiroTransactions().process_transactions()
+
+
+def dividend():
+    from dividend import DegiroDividend
+    DegiroDividend().dividend_overview()
+
+
+def benchmarks():
+    # Download the benchmark prices for the graphs while the reports are processed
+    from reciever import DegiroReciever
+    from ticker_data import get_ticker_data
+    get_ticker_data(DegiroReciever().get_start_date().date(), datetime.now().date() - timedelta(1))
+
+
+def graphs(workers=None):
+    from graphs import DegiroGraphs, GRAPH_WORKERS
+    DegiroGraphs().make_plots(workers or GRAPH_WORKERS)
+
+
+def get_stages(force:list[str]=[], graph_workers:int=None):
+    # A forced 'verwerken' processes all days again instead of only the new days
+    month = datetime.now().strftime("%m-%Y")
+    return [
+        Stage("ophalen", receive, always=True),
+        Stage("verwerken", partial(process, full_rebuild="verwerken" in force or "all" in force),
+              inputs=["data\\cash.csv", "data\\transactions.csv", "data\\portfolio"],
+              outputs=["Degiro - Waarde.csv", "Degiro - Rendement.csv"],
+              after=["ophalen"], mode="process"),
+        Stage("transacties", transactions,
+              inputs=["data\\transactions.csv"],
+              outputs=["Degiro - Transacties.csv"],
+              period=month, after=["ophalen"], mode="process"),
+        Stage("dividend", dividend,
+              inputs=["data\\cash.csv", "data\\portfolio"],
+              outputs=["Degiro - Dividend - Overzicht.csv", "Degiro - Dividend - Totaal.csv", "Degiro - Dividend - Betalingen.csv"],
+              period=month, after=["ophalen"], mode="process"),
+        Stage("koersen", benchmarks,
+              inputs=["data\\cash.csv", "data\\transactions.csv"],
+              period=datetime.now().strftime("%d-%m-%Y"), after=["ophalen"], mode="thread"),
+        Stage("grafieken", partial(graphs, graph_workers),
+              inputs=["Degiro - Waarde.csv", "Degiro - Rendement.csv", "Degiro - Transacties.csv"],
+              outputs=["graphs"],
+              after=["verwerken", "transacties", "koersen"])]
+
 
 if __name__ == "__main__":
+    # The graphs are made in separate processes, which also start this executable
+    freeze_support()
+    parser = ArgumentParser()
+    parser.add_argument("--force", action="append", default=[], choices=[stage.name for stage in get_stages()] + ["all"],
+                        metavar="STAGE", help="Run a stage also when nothing changed, 'all' runs every stage. "
+                                              "A forced 'verwerken' processes all days again")
+    parser.add_argument("--graph-workers", type=int, metavar="N",
+                        help="Number of graphs made at the same time, every graph needs about 100 MB of memory (default 4 or less)")
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Save the time, memory, files and downloads of every stage and graph in '{PROFILE_PATH}'")
+    parser.add_argument("--cprofile", action="store_true",
+                        help="Also save a cProfile dump of every stage, implies --profile")
+    args = parser.parse_args()
+    if args.profile or args.cprofile:
+        environ[PROFILE_VARIABLE] = "cprofile" if args.cprofile else "profile"
+
     try:
-        DegiroReciever().save_reports()
-        DegiroProcessor().process_stats()
-        DegiroTransactions().process_transactions()
-        DegiroDividend().dividend_overview()
-        DegiroGraphs().make_plots()
+        Pipeline(get_stages(args.force, args.graph_workers)).run(force=args.force)
     except Exception as e:
         print("Error:", e)
     finally:
@@ -1,8 +1,11 @@
-from pandas import DataFrame, read_csv
+from pandas import DataFrame, Series, read_csv, to_datetime, concat, isna
+from itertools import accumulate
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 import locale 
 
+from portfolio import read_portfolio_report
+
 locale.setlocale(locale.LC_TIME, 'nl_NL.UTF-8')
 
 
@@ -29,33 +32,46 @@ def get_next_month(datum:date):
     return next_month - timedelta(days=next_month.day-1)
 
 
-def same_month(date1:date, date2:date):
-    if date1.year == date2.year and date1.month == date2.month:
-        return True
-    return False
+def get_months(start:date):
+    # All months from the month of start up to yesterday, as (year, month, month name)
+    datum = get_last_date(start)
+    months = []
+    while datum < datetime.now().date() - timedelta(1):
+        months.append((datum.year, datum.month, datum.strftime("%B")))
+        datum = get_next_month(datum)
+    return months
 
 
-def get_exchange(date:date, stock:str, valuta:str):
-    date_formatted = date.strftime("%d-%m-%Y")
-    value_report = read_csv(f"data\\portfolio\\Portfolio {date_formatted}.csv", sep=";")
-    records = value_report[value_report["Product"] == stock]
+def running_total(amounts:Series):
+    # Cumulative sum, rounded after every step like the totals have always been
+    totals = accumulate([0] + amounts.tolist(), lambda total, amount: round(total + amount, 3))
+    return Series(data=list(totals)[1:], index=amounts.index)
+
 
-    if len(records) == 0:
-        return get_exchange(date - timedelta(days=1), stock, valuta)
+def get_position(date:date, stock:str):
+    # Walk back to the most recent report that contains the stock
+    while True:
+        value_report = read_portfolio_report(date)
+        records = value_report[value_report["Product"] == stock]
+        if len(records) > 0:
+            return value_report, records.iloc[0]
+        date -= timedelta(days=1)
 
-    record = records.iloc[0]
-    waarde_eur = float(record["Waarde in EUR"].replace(",", "."))
-    waarde_lokaal = float(record["Lokale waarde"].split(" ")[-1])
+
+def get_exchange(date:date, stock:str, valuta:str):
+    value_report, record = get_position(date, stock)
+    waarde_eur = float(record["Waarde in EUR"])
+    waarde_lokaal = float(record["Lokale waarde"])
     exchange = waarde_lokaal / waarde_eur
 
-    if record["Lokale waarde"].split(" ")[0] != valuta:
-        df_valuta = value_report[value_report["Lokale waarde"].str.contains(valuta)]
+    if record["Lokale valuta"] != valuta:
+        df_valuta = value_report[value_report["Lokale valuta"] == valuta]
         if len(df_valuta) == 0:
             return 1, waarde_eur
         record = df_valuta.loc[df_valuta["Waarde in EUR"].idxmax()]
-        waarde_lokaal = float(record["Lokale waarde"].split(" ")[-1])
+        waarde_lokaal = float(record["Lokale waarde"])
 
-        exchange = waarde_lokaal / float(record["Waarde in EUR"].replace(",", "."))
+        exchange = waarde_lokaal / float(record["Waarde in EUR"])
     return exchange, waarde_eur
 
 
@@ -64,30 +80,33 @@ class DegiroDividend:
         self.cash = read_csv("data\\cash.csv", sep=";")
 
 
-    def get_belasting(self, stock:str, datum:str):
-        record = self.cash[(self.cash["Omschrijving"] == "Dividendbelasting") &
-                    (self.cash["Product"] == stock) & 
-                    (self.cash["Datum"] == datum)]
-        if len(record) == 0:
-            return 0
-        return abs(record.iloc[0]["Unnamed: 8"])
-  
+    def get_belastingen(self):
+        # Every dividend with the dividend tax of the same product on the same day, matched in one merge
+        dividends = self.cash[self.cash["Omschrijving"] == "Dividend"]
+        belastingen = self.cash[(self.cash["Omschrijving"] == "Dividendbelasting") & self.cash["Product"].notna()]
+        belastingen = belastingen.drop_duplicates(["Product", "Datum"])[["Product", "Datum", "Unnamed: 8"]]
+        belastingen = belastingen.rename(columns={"Unnamed: 8": "Belasting"})
+        return dividends.merge(belastingen, on=["Product", "Datum"], how="left", indicator="Gevonden")
+
 
     def get_dividends(self):
         self.dividends = []
-        for _, row in self.cash[self.cash["Omschrijving"] == "Dividend"].iterrows():
-            datum = datetime.strptime(row["Datum"], "%d-%m-%Y").date()
+        dividends = self.get_belastingen()
+        datums = to_datetime(dividends["Datum"], format="%d-%m-%Y").dt.date
 
+        for datum, stock, amount, currency, belasting, gevonden in zip(
+                datums, dividends["Product"], dividends["Unnamed: 8"], dividends["Saldo"], dividends["Belasting"], dividends["Gevonden"]):
             dividend = Dividend(
                 datum=datum,
-                stock=row["Product"],
-                amount=row["Unnamed: 8"],
-                currency=row["Saldo"])
+                stock=stock,
+                amount=amount,
+                currency=currency)
 
-            try:
-                dividend.belasting = self.get_belasting(dividend.stock, dividend.datum.strftime("%d-%m-%Y"))
-            except:
-                print(f"Waarschuwing: Bij het dividend van '{dividend.stock}' kon de dividendbelasting niet gevonden worden.")
+            if gevonden == "both":
+                # A dividend tax line without an amount leaves the results of this dividend empty
+                dividend.belasting = abs(belasting)
+                if isna(belasting):
+                    print(f"Waarschuwing: Bij het dividend van '{dividend.stock}' kon de dividendbelasting niet gevonden worden.")
 
             try:
                 dividend.exchange, dividend.aandelen_waarde = get_exchange(dividend.datum, dividend.stock, dividend.currency)
@@ -102,51 +121,45 @@ class DegiroDividend:
 
 
     def dividend_verwerken(self):
-        datum = min([dividend.datum for dividend in self.dividends])
-        datum = get_last_date(datum)
-
-        df_dividend = DataFrame(columns=["Jaar", "Maand"])
-        df_betalingen = DataFrame(columns=["Jaar", "Maand"])
-
-        dividend_totaal = {}
-        belasting_totaal = 0
-
-        while datum < datetime.now().date() - timedelta(1):
-            maand_naam = datum.strftime("%B")
-
-            dividend_totaal["Jaar"] = [datum.year]
-            dividend_totaal["Maand"] = [maand_naam]
-
-            betalingen = {}
-            betalingen["Jaar"] = [str(datum.year)]
-            betalingen["Maand"] = [maand_naam]
-            betalingen["Dividendbelasting"] = 0
-
-            dividend_dag = [dividend for dividend in self.dividends if same_month(dividend.datum, datum)]
-            for dividend in dividend_dag:
-                belasting_totaal += dividend.belasting / dividend.exchange
-                betalingen["Dividendbelasting"] += dividend.belasting / dividend.exchange
-
-
-                betalingen[dividend.stock] = [round(dividend.amount_eur, 3)]
-                if dividend.stock in dividend_totaal.keys():
-                    dividend_totaal[dividend.stock] = [round(dividend_totaal[dividend.stock][0] + dividend.amount_eur, 3)]
-                else:
-                    dividend_totaal[dividend.stock] = [round(dividend.amount_eur, 3)]
-
-            # Betalingen regel toevoegen
-            if len(dividend_dag) > 0:
-                betalingen["Dividendbelasting"] = round(betalingen["Dividendbelasting"], 3)
-                df_betalingen = df_betalingen.merge(DataFrame.from_dict(betalingen), how="outer")
-
-            df_dividend = df_dividend.merge(DataFrame.from_dict(dividend_totaal), how="outer")
-            datum = get_next_month(datum)
-
-        # Totaal regel toevoegen aan betalingen
-        dividend_totaal["Jaar"] = ["Totaal"]
-        dividend_totaal["Maand"] = [""]
-        dividend_totaal["Dividendbelasting"] = belasting_totaal
-        df_betalingen = df_betalingen.merge(DataFrame.from_dict(dividend_totaal), how="outer")
+        maanden = DataFrame(data=get_months(min([dividend.datum for dividend in self.dividends])), columns=["Jaar", "Maand", "Maandnaam"])
+
+        # Every dividend bucketed by (year, month) once, in the original order within a month
+        dividenden = DataFrame(
+            data=[[dividend.datum.year, dividend.datum.month, dividend.stock, dividend.amount_eur, dividend.belasting / dividend.exchange]
+                  for dividend in self.dividends],
+            columns=["Jaar", "Maand", "Product", "Dividend", "Belasting"])
+        dividenden = dividenden.merge(maanden, on=["Jaar", "Maand"]).sort_values(["Jaar", "Maand"], kind="stable")
+        dividenden["Totaal"] = dividenden.groupby("Product")["Dividend"].transform(running_total)
+        stocks = list(dict.fromkeys(dividenden["Product"]))
+
+        # Running total per stock at the end of every month, also for the months without dividend
+        laatste = dividenden.drop_duplicates(["Jaar", "Maand", "Product"], keep="last")
+        laatste = laatste.assign(Betaald=laatste["Dividend"].map(lambda dividend: round(dividend, 3)))
+        totalen = laatste.pivot(index=["Jaar", "Maand"], columns="Product", values="Totaal")
+        totalen = totalen.reindex(index=maanden.set_index(["Jaar", "Maand"]).index, columns=stocks).ffill()
+        df_dividend = maanden[["Jaar", "Maandnaam"]].rename(columns={"Maandnaam": "Maand"})
+        df_dividend = concat([df_dividend, totalen.reset_index(drop=True)], axis=1)
+        df_dividend = df_dividend.sort_values(["Jaar", "Maand"], kind="stable")
+
+        # Payments per month with dividend, and a total line
+        betalingen = laatste.pivot(index=["Jaar", "Maand"], columns="Product", values="Betaald").reindex(columns=stocks)
+        belastingen = dividenden.groupby(["Jaar", "Maand"])["Belasting"].agg(lambda belasting: round(sum(belasting.tolist()), 3))
+        betaal_maanden = maanden.set_index(["Jaar", "Maand"]).loc[betalingen.index]
+        df_betalingen = DataFrame(data={
+            "Jaar": [str(jaar) for jaar, _ in betalingen.index],
+            "Maand": betaal_maanden["Maandnaam"].tolist(),
+            "Dividendbelasting": belastingen.loc[betalingen.index].tolist()})
+        df_betalingen = concat([df_betalingen, betalingen.reset_index(drop=True)], axis=1)
+        df_betalingen = df_betalingen.sort_values(["Jaar", "Maand"], kind="stable")
+
+        totaal = {"Jaar": ["Totaal"], "Maand": [""], "Dividendbelasting": [sum(dividenden["Belasting"].tolist())]}
+        if len(totalen) > 0:
+            totaal |= {stock: [total] for stock, total in totalen.iloc[-1].items()}
+        if len(df_betalingen) > 0:
+            df_betalingen = concat([df_betalingen, DataFrame(data=totaal)], ignore_index=True)
+        else:
+            # Concatenating to the empty columns would make the total a float
+            df_betalingen = DataFrame(data=totaal)
 
         dividend_list = [[dividend.datum, 
                         dividend.stock, 
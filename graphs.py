@@ -1,16 +1,24 @@
-from pandas import DataFrame, merge, read_csv
-from datetime import datetime, date, timedelta
+from pandas import DataFrame, Timestamp, concat, read_csv, to_datetime
+from pandas.util import hash_pandas_object
+from datetime import datetime, date
+import matplotlib
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mtick
 from pathlib import Path
 import numpy as np
 from seaborn import color_palette
-from requests import get
-from time import mktime
-from functools import reduce
 from math import floor, ceil
+from os import cpu_count, replace
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import freeze_support
+from hashlib import sha256
+import json
 
-from ticker_data import get_ticker_data
+import ticker_data
+import profiling
+from ticker_data import BENCHMARKS, get_ticker_data
+from returns import performance
 
 SMALL_FONT_SIZE = 14
 MEDIUM_FONT_SIZE = 20
@@ -18,6 +26,17 @@ BIGGER_FONT_SIZE = 30
 
 NUMBER_OF_BINS = 100
 
+GRAPH_DPI = 200
+STACKED_FIGURE_SIZE = (50, 15)
+STACKED_LEFT, STACKED_RIGHT = 0.029, 0.79     # Part of the stacked value graph that is taken by the axes
+# Days in the stacked value graph before they are combined per week, and then per month: one day per pixel of the axes
+STACKED_MAX_POINTS = int(STACKED_FIGURE_SIZE[0] * GRAPH_DPI * (STACKED_RIGHT - STACKED_LEFT))
+STACKED_MIN_SHARE = 0.002   # Positions that never reach this part of the highest portfolio value are shown as "Overig"
+
+# Number of graphs made at the same time, 1 makes them one by one. Every worker holds a figure of about 100 MB
+GRAPH_WORKERS = min(cpu_count() or 1, 4)
+RENDER_MANIFEST = "data\\graphs.json"     # Fingerprint of the data of every saved graph
+
 plt.style.use('seaborn-v0_8')
 plt.rc('font', size=SMALL_FONT_SIZE)          # controls default text sizes
 plt.rc('axes', titlesize=MEDIUM_FONT_SIZE)     # fontsize of the axes title
@@ -28,56 +47,6 @@ plt.rc('legend', fontsize=MEDIUM_FONT_SIZE)   # legend fontsize
 plt.rc('figure', titlesize=BIGGER_FONT_SIZE)  # fontsize of the figure title
 
 
-def get_prev_date(datum:date, values:dict):
-    if datum in values.keys():
-        return datum
-    return get_prev_date(datum - timedelta(1), values)
-
-
-def get_data(start, end, ticker):
-    url = f"https://query2.finance.yahoo.com/v8/finance/chart/{ticker}?period1={start}&period2={end}&interval=1d&includePrePost=true&events=split"
-    res = get(url, headers={"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate, br", "Accept": "*/*", "User-Agent": "Chrome/122.0.0.0"})
-    json_data = res.json()["chart"]["result"][0]
-    dates = [datetime.fromtimestamp(date).date() for date in json_data["timestamp"]]
-    values = json_data["indicators"]["quote"][0]["close"]
-    return {datum: value for datum, value in zip(dates, values)}
-
-
-def get_tracking(start, end, values, ticker):
-    datum = start
-    tracked_data = {"Datum": [], ticker: []}
-    tracked = 100
-    while datum <= end:
-        date_formatted = datum.strftime("%d-%m-%Y")
-        if datum not in values.keys():
-            percentage = 0
-        else:
-            prev_datum = get_prev_date(datum - timedelta(1), values)
-            change = values[datum] - values[prev_datum]
-            percentage = change / values[prev_datum] * 100
-
-        tracked = tracked * (1 + percentage/100)
-
-        tracked_data["Datum"] = tracked_data["Datum"] + [date_formatted]
-        tracked_data[ticker] = tracked_data[ticker] + [tracked - 100]
-        datum += timedelta(1)
-    return DataFrame(data=tracked_data)
-
-
-def get_ticker_data(start:date, end:date, tickers=["%5EGSPC", "%5EIXIC"]):
-    start_timestamp = int(mktime((start-timedelta(10)).timetuple()))
-    end_timestamp = int(mktime(end.timetuple()))
-
-    tracked_tickers = []
-    for ticker in tickers:
-        values = get_data(start_timestamp, end_timestamp, ticker)
-        tracked_data = get_tracking(start, end, values, ticker)
-        tracked_tickers.append(tracked_data)
-
-    df_merged = reduce(lambda  left,right: merge(left,right,on=['Datum'], how='outer'), tracked_tickers).fillna(0)
-    return df_merged
-
-
 def process_column_name(column:str):
     def remove_end(name:str, end:list[str]):
         for i in end:
@@ -89,6 +58,27 @@ def process_column_name(column:str):
     return remove_end(column, ["LTD", "C", "IN"])
 
 
+def get_plot_hash(plot_path:Path, data:list[DataFrame], *parameters):
+    # Fingerprint of the graph, its settings and the exact data that is shown in it
+    plot_hash = sha256(repr((str(plot_path), parameters)).encode())
+    for df in data:
+        plot_hash.update(repr(list(df.columns)).encode())
+        plot_hash.update(hash_pandas_object(df).to_numpy().tobytes())
+    return plot_hash.hexdigest()
+
+
+def start_worker(degiro_graphs, prices:dict):
+    # Every worker process gets the data and the downloaded benchmark prices once
+    global worker_graphs
+    worker_graphs = degiro_graphs
+    ticker_data.prices.update(prices)
+
+
+def make_plot(plot:str, args:tuple):
+    # The fingerprint of the graph, with its measurements when profiling is on
+    return profiling.measure(getattr(worker_graphs, plot), *args)
+
+
 class DegiroGraphs():
     def __init__(self):
         if not Path("graphs").exists():
@@ -98,6 +88,10 @@ class DegiroGraphs():
         self.stats_df = read_csv(f"Degiro - Rendement.csv", sep=";", decimal=",")
         self.aankopen_df = read_csv(f"Degiro - Transacties.csv", sep=";", decimal=",")
 
+        # The dates are parsed once, every graph selects its period by slicing the index
+        self.values_df.index = to_datetime(self.values_df["Datum"], format="%d-%m-%Y").rename(None)
+        self.stats_df.index = to_datetime(self.stats_df["Datum"], format="%d-%m-%Y").rename(None)
+
         if not Path(f"Degiro - Waarde.csv").exists():
             raise Exception("Er is geen data bekend. Controleer of 'Degiro - Waarde.csv' bestaat.")
         if not Path(f"Degiro - Rendement.csv").exists():
@@ -105,31 +99,79 @@ class DegiroGraphs():
         if not Path(f"Degiro - Transacties.csv").exists():
             raise Exception("Er is geen data bekend. Controleer of 'Degiro - Transacties.csv' bestaat.")
 
+        self.rendered = self.load_manifest()
+
+
+    def load_manifest(self):
+        # A manifest that can not be read is left out, then all graphs are made again
+        try:
+            with open(RENDER_MANIFEST, "r") as file:
+                rendered = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            print(f"Waarschuwing: '{RENDER_MANIFEST}' is beschadigd, alle grafieken worden opnieuw gemaakt.")
+            return {}
+        return rendered if isinstance(rendered, dict) else {}
+
+
+    def is_rendered(self, plot_path:Path, plot_hash:str):
+        return plot_path.exists() and self.rendered.get(str(plot_path)) == plot_hash
+
+
+    def save_manifest(self):
+        # Written to a temporary file first, so a run that is stopped halfway never leaves half a manifest
+        with open(f"{RENDER_MANIFEST}.tmp", "w") as file:
+            json.dump(self.rendered, file, indent=4)
+        replace(f"{RENDER_MANIFEST}.tmp", RENDER_MANIFEST)
+
+
+    def get_selection(self, df:DataFrame, start_date:date, end_date:date):
+        # Positions of the rows from start_date up to and including end_date
+        return df.index.slice_indexer(Timestamp(start_date), Timestamp(end_date))
+
 
     def make_stacked_value_plot(self,
                                 plot_path:Path,
                                 start_date=date(2000,1,1),
                                 end_date=datetime.now().date()):
         
-        if plot_path.exists() and end_date.year != datetime.now().year:
-            return
-        
         # Select data to plot
-        dates = self.values_df.apply(lambda x: datetime.strptime(x["Datum"], "%d-%m-%Y"), axis=1)
-        conditions = [date.date() >= start_date and date.date() <= end_date for date in dates]
+        selection = self.values_df.iloc[self.get_selection(self.values_df, start_date, end_date)]
 
-        dates_selection = [date for date, condition in zip(dates, conditions) if condition]
-        values_selection = self.values_df[conditions].drop('Datum', axis=1).dropna(axis=1, how="all").fillna(0)
+        # Skip the graph when it was made from exactly the same data before
+        plot_hash = get_plot_hash(plot_path, [selection], STACKED_MAX_POINTS, STACKED_MIN_SHARE)
+        if self.is_rendered(plot_path, plot_hash):
+            return plot_hash
+
+        values_selection = selection.drop('Datum', axis=1).dropna(axis=1, how="all").fillna(0)
         values_selection = values_selection.reindex(sorted(values_selection.columns), axis=1)
+
+        # Only the last day of every week, and then of every month, when there are more days than the graph can show.
+        # The value at the end of the period is kept on purpose, like every day shows the value at the end of the day,
+        # a mean or sum would show portfolio values that never existed
+        for period in ["W", "M"]:
+            if not STACKED_MAX_POINTS or len(values_selection) <= STACKED_MAX_POINTS:
+                break
+            last_days = ~values_selection.index.to_period(period).duplicated(keep="last")
+            last_days[0] = True
+            values_selection = values_selection[last_days]
+        dates_selection = values_selection.index
+
+        # Combine the small positions into one band
+        small_columns = values_selection.columns[values_selection.max() < values_selection.sum(axis=1).max() * STACKED_MIN_SHARE]
+        other = len(small_columns) > 1
+        if other:
+            values_selection = concat([values_selection.drop(columns=small_columns), values_selection[small_columns].sum(axis=1).rename("Overig")], axis=1)
         columns_selection = [process_column_name(column) for column in values_selection.columns]
 
         # Create figure
-        fig, ax = plt.subplots(figsize=(50, 15))
+        fig, ax = plt.subplots(figsize=STACKED_FIGURE_SIZE)
         fig.suptitle(plot_path.stem)
-        fig.subplots_adjust(left=0.029, right=0.79, top=0.94, bottom=0.053)
+        fig.subplots_adjust(left=STACKED_LEFT, right=STACKED_RIGHT, top=0.94, bottom=0.053)
 
         # Plot data
-        col = color_palette("gist_rainbow", len(values_selection.columns))
+        col = color_palette("gist_rainbow", len(values_selection.columns) - other) + (["grey"] if other else [])
         #seismic
         #cool
         #viridis
@@ -154,9 +196,10 @@ class DegiroGraphs():
         ax.set_ylabel("Waarde (Euro)")
         ax.yaxis.set_major_formatter(mtick.FuncFormatter(lambda x, _: '€{:,.0f}'.format(x).replace(',', '.')))
 
-        fig.savefig(plot_path, format="png", dpi=200)
+        fig.savefig(plot_path, format="png", dpi=GRAPH_DPI)
         plt.close(fig)
         print(f"Grafiek '{plot_path.stem}' opgeslagen!")
+        return plot_hash
 
 
     def make_scatterplot_daily_change(self,
@@ -164,18 +207,18 @@ class DegiroGraphs():
                                       start_date=date(2000,1,1),
                                       end_date=datetime.now().date()):
         
-        if plot_path.exists() and end_date.year != datetime.now().year:
-            return
-        
         # Select data to plot
-        dates = self.stats_df.apply(lambda x: datetime.strptime(x["Datum"], "%d-%m-%Y"), axis=1)
-        conditions = [date.date() >= start_date and date.date() <= end_date for date in dates]
-        dates_selection = {index:date for index, (date, condition) in enumerate(zip(dates, conditions)) if condition}
+        positions = self.get_selection(self.stats_df, start_date, end_date)
+
+        # Skip the graph when it was made from exactly the same data before
+        plot_hash = get_plot_hash(plot_path, [self.stats_df.iloc[positions][["Dagelijks rendement(%)", "Dagelijks rendement"]]])
+        if self.is_rendered(plot_path, plot_hash):
+            return plot_hash
 
         # Define data to plot
-        c = list(dates_selection.keys())
-        x = self.stats_df[conditions]["Dagelijks rendement(%)"]
-        y = self.stats_df[conditions]["Dagelijks rendement"]
+        c = list(range(len(self.stats_df)))[positions]
+        x = self.stats_df.iloc[positions]["Dagelijks rendement(%)"]
+        y = self.stats_df.iloc[positions]["Dagelijks rendement"]
 
         # Create figure
         fig, ax = plt.subplots(figsize=(40, 15))
@@ -187,7 +230,7 @@ class DegiroGraphs():
 
         # Define color bar
         cbar = plt.colorbar(pad=0.015, ticks=np.linspace(min(c), max(c), 8))  # Adjust the number of ticks as needed
-        cbar.ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda color_int, _: dates_selection[int(color_int)].strftime("%d-%m-%Y")))
+        cbar.ax.yaxis.set_major_formatter(plt.FuncFormatter(lambda color_int, _: self.stats_df.index[int(color_int)].strftime("%d-%m-%Y")))
 
         # Create lines at x=0 and y=0, as axis
         ax.axhline(y=0, color="black")
@@ -198,9 +241,10 @@ class DegiroGraphs():
         ax.set_ylabel("Waardestijging (Euro)")
         ax.yaxis.set_major_formatter(mtick.FuncFormatter(lambda c, _: '€{:,.0f}'.format(c).replace(',', '.')))
 
-        fig.savefig(plot_path, format="png", dpi=200)
+        fig.savefig(plot_path, format="png", dpi=GRAPH_DPI)
         plt.close(fig)
         print(f"Grafiek '{plot_path.stem}' opgeslagen!")
+        return plot_hash
 
 
     def make_profit_plot(self,
@@ -208,17 +252,17 @@ class DegiroGraphs():
                          start_date=date(2000,1,1),
                          end_date=datetime.now().date()):
         
-        if plot_path.exists() and end_date.year != datetime.now().year:
-            return
-        
         # Select data to plot
-        dates = self.stats_df.apply(lambda x: datetime.strptime(x["Datum"], "%d-%m-%Y"), axis=1)
-        conditions = [date.date() >= start_date and date.date() <= end_date for date in dates]
-        dates_selection = [date for date, condition in zip(dates, conditions) if condition]
+        selection = self.stats_df.iloc[self.get_selection(self.stats_df, start_date, end_date)]
+        dates_selection = selection.index
 
         # Define data to plot
-        values_selection = self.stats_df[conditions][["Datum","Waarde", "Inleg", "Rendement"]]
-        values_selection["Datum"] = dates_selection
+        values_selection = selection[["Waarde", "Inleg", "Rendement"]]
+
+        # Skip the graph when it was made from exactly the same data before
+        plot_hash = get_plot_hash(plot_path, [values_selection])
+        if self.is_rendered(plot_path, plot_hash):
+            return plot_hash
 
         # Create figure
         fig, ax = plt.subplots(figsize=(40, 15))
@@ -245,9 +289,10 @@ class DegiroGraphs():
         ax.set_ylabel("Waarde (Euro)")
         ax.yaxis.set_major_formatter(mtick.FuncFormatter(lambda c, _: '€{:,.0f}'.format(c).replace(',', '.')))
 
-        fig.savefig(plot_path, format="png", dpi=200)
+        fig.savefig(plot_path, format="png", dpi=GRAPH_DPI)
         plt.close(fig)
         print(f"Grafiek '{plot_path.stem}' opgeslagen!")
+        return plot_hash
 
 
     def make_histogram_plot(self,
@@ -256,15 +301,16 @@ class DegiroGraphs():
                             start_date=date(2000,1,1),
                             end_date=datetime.now().date()):
 
-        if plot_path.exists() and end_date.year != datetime.now().year:
-            return
-        
         # Select data to plot
-        dates = self.stats_df.apply(lambda x: datetime.strptime(x["Datum"], "%d-%m-%Y"), axis=1)
-        conditions = [date.date() >= start_date and date.date() <= end_date and date.weekday() <= 4 for date in dates]
+        selection = self.stats_df.iloc[self.get_selection(self.stats_df, start_date, end_date)]
 
-        # Define data to plot
-        data = self.stats_df[conditions][kolom]
+        # Define data to plot, only the working days
+        data = selection[selection.index.weekday <= 4][kolom]
+
+        # Skip the graph when it was made from exactly the same data before
+        plot_hash = get_plot_hash(plot_path, [data.to_frame()], NUMBER_OF_BINS)
+        if self.is_rendered(plot_path, plot_hash):
+            return plot_hash
 
         # Create figure
         fig, ax = plt.subplots(figsize=(40, 15))
@@ -297,9 +343,10 @@ class DegiroGraphs():
         elif kolom == "Dagelijks rendement(%)":
             ax.xaxis.set_major_formatter(mtick.FuncFormatter(lambda c, _: '{:,.0f}%'.format(c).replace(',', '.')))
 
-        fig.savefig(plot_path, format="png", dpi=200)
+        fig.savefig(plot_path, format="png", dpi=GRAPH_DPI)
         plt.close(fig)
         print(f"Grafiek '{plot_path.stem}' opgeslagen!")
+        return plot_hash
 
 
     def make_profit_line(self,
@@ -307,20 +354,11 @@ class DegiroGraphs():
                          start_date=date(2000,1,1),
                          end_date=datetime.now().date()):
 
-        def track(row):
-            self.tracked_percentage = self.tracked_percentage * (1 + row["Dagelijks rendement(%)"]/100)
-            return self.tracked_percentage - 100
-        
-        self.tracked_percentage = 100
-        if plot_path.exists() and end_date.year != datetime.now().year:
-            return
-        
         # Select data to plot
-        dates = self.stats_df.apply(lambda x: datetime.strptime(x["Datum"], "%d-%m-%Y"), axis=1)
-        conditions = [date.date() >= start_date and date.date() <= end_date for date in dates]
-        dates_selection = [date for date, condition in zip(dates, conditions) if condition]
+        selection = self.stats_df.iloc[self.get_selection(self.stats_df, start_date, end_date)]
+        dates_selection = selection.index
 
-        tickers = {"S&P 500": "%5EGSPC", "NASDAQ": "%5EIXIC"}
+        tickers = BENCHMARKS
         try:
             ticker_data = get_ticker_data(min(dates_selection).date(), max(dates_selection).date(), tickers=tickers.values())
         except Exception as e:
@@ -328,17 +366,24 @@ class DegiroGraphs():
             ticker_data = DataFrame(data={"Datum": []}|{ticker: [] for ticker in tickers.values()})
 
         # Define data to plot
-        values_selection = self.stats_df[conditions][["Datum", "Dagelijks rendement(%)"]]
+        values_selection = selection[["Datum", "Dagelijks rendement(%)"]]
         values_selection = values_selection.merge(ticker_data, on="Datum", how="left").fillna(0)
         values_selection["Datum"] = dates_selection
-        values_selection["Rendement_tracked"] = values_selection.apply(track, axis=1)
+        values_selection["Rendement_tracked"] = performance(values_selection["Dagelijks rendement(%)"] / 100)
+
+        # Skip the graph when it was made from exactly the same data before
+        plot_hash = get_plot_hash(plot_path, [values_selection], tickers)
+        if self.is_rendered(plot_path, plot_hash):
+            return plot_hash
  
         # Create figure
         fig, ax = plt.subplots(figsize=(40, 15))
         fig.suptitle(plot_path.stem)
         fig.subplots_adjust(left=0.039, right=0.98, top=0.94, bottom=0.053)
 
-        # Plot data
+        # Plot data, with a color for every line when there are more benchmarks than default colors
+        if len(tickers) + 1 > len(plt.rcParams["axes.prop_cycle"]):
+            ax.set_prop_cycle(color=color_palette("husl", len(tickers) + 1))
         ax.plot(dates_selection, values_selection[["Rendement_tracked", *tickers.values()]], label=["Portfolio", *tickers.keys()])
 
         # Create legend
@@ -360,20 +405,23 @@ class DegiroGraphs():
         ax.set_ylabel("Performance (%)")
         ax.yaxis.set_major_formatter(mtick.FuncFormatter(lambda c, _: '{:,.0f}%'.format(c).replace(',', '.')))
 
-        fig.savefig(plot_path, format="png", dpi=200)
+        fig.savefig(plot_path, format="png", dpi=GRAPH_DPI)
         plt.close(fig)
         print(f"Grafiek '{plot_path.stem}' opgeslagen!")
+        return plot_hash
 
 
     def make_purchases_plot(self, plot_path:Path, jaar:int):
-        if plot_path.exists() and jaar != datetime.now().year:
-            return
-        
         # Define data to plot
         data = self.aankopen_df
         if jaar:
             data = self.aankopen_df[self.aankopen_df["Jaar"] == jaar]
 
+        # Skip the graph when it was made from exactly the same data before
+        plot_hash = get_plot_hash(plot_path, [data])
+        if self.is_rendered(plot_path, plot_hash):
+            return plot_hash
+
         # Create figure
         fig, ax = plt.subplots(figsize=(40, 15))
         fig.suptitle(plot_path.stem)
@@ -393,60 +441,90 @@ class DegiroGraphs():
         ax.set_xticks(np.arange(data.shape[0]) + width/2, data["Maand"])
         ax.legend(loc="upper left", ncols=3)
 
-        fig.savefig(plot_path, format="png", dpi=200)
+        fig.savefig(plot_path, format="png", dpi=GRAPH_DPI)
         plt.close(fig)
         print(f"Grafiek '{plot_path.stem}' opgeslagen!")
+        return plot_hash
 
 
-    def make_plots(self):
-        print("Grafieken maken...")     
-        self.make_profit_plot(Path("graphs\\Portfolio - Rendement.png"))
-        self.make_stacked_value_plot(Path("graphs\\Portfolio - Waarde.png"))
-        self.make_profit_line(Path(f"graphs\\Portfolio - Performance.png"))
-        self.make_scatterplot_daily_change(Path("graphs\\Veranderingen - Verhouding.png"))
-        self.make_histogram_plot(Path("graphs\\Veranderingen - Procentueel.png"), "Dagelijks rendement(%)")
-        self.make_histogram_plot(Path("graphs\\Veranderingen - Waarde.png"), "Dagelijks rendement")
+    def get_plots(self):
+        plots = [
+            ("make_profit_plot", (Path("graphs\\Portfolio - Rendement.png"),)),
+            ("make_stacked_value_plot", (Path("graphs\\Portfolio - Waarde.png"),)),
+            ("make_profit_line", (Path(f"graphs\\Portfolio - Performance.png"),)),
+            ("make_scatterplot_daily_change", (Path("graphs\\Veranderingen - Verhouding.png"),)),
+            ("make_histogram_plot", (Path("graphs\\Veranderingen - Procentueel.png"), "Dagelijks rendement(%)")),
+            ("make_histogram_plot", (Path("graphs\\Veranderingen - Waarde.png"), "Dagelijks rendement"))]
 
-        dates = self.values_df.apply(lambda x: datetime.strptime(x["Datum"], "%d-%m-%Y"), axis=1)
-        for year in range(min(dates).year, max(dates).year + 1):
+        for year in range(self.values_df.index.min().year, self.values_df.index.max().year + 1):
             if not Path(f"graphs\\{year}").exists():
                 Path(f"graphs\\{year}").mkdir()
 
-            self.make_profit_plot(
-                Path(f"graphs\\{year}\\Portfolio - Rendement {year}.png"),
-                date(year, 1, 1),
-                date(year, 12, 31))
-            self.make_stacked_value_plot(
-                Path(f"graphs\\{year}\\Portfolio - Waarde {year}.png"),
-                date(year, 1, 1),
-                date(year, 12, 31))
-            self.make_profit_line(
-                Path(f"graphs\\{year}\\Portfolio - Performance {year}.png"), 
-                date(year, 1, 1),
-                date(year, 12, 31))
-            self.make_scatterplot_daily_change(
-                Path(f"graphs\\{year}\\Veranderingen - Verhouding {year}.png"),
-                date(year, 1, 1),
-                date(year, 12, 31))
-            self.make_histogram_plot(
-                Path(f"graphs\\{year}\\Veranderingen - Procentueel {year}.png"),
-                "Dagelijks rendement(%)",
-                date(year, 1, 1),
-                date(year, 12, 31))
-            self.make_histogram_plot(
-                Path(f"graphs\\{year}\\Veranderingen - Waarde {year}.png"),
-                "Dagelijks rendement",
-                date(year, 1, 1),
-                date(year, 12, 31))
-            self.make_purchases_plot(
-                Path(f"graphs\\{year}\\Transacties {year}.png"),
-                year)
-            
+            plots += [
+                ("make_profit_plot", (
+                    Path(f"graphs\\{year}\\Portfolio - Rendement {year}.png"),
+                    date(year, 1, 1),
+                    date(year, 12, 31))),
+                ("make_stacked_value_plot", (
+                    Path(f"graphs\\{year}\\Portfolio - Waarde {year}.png"),
+                    date(year, 1, 1),
+                    date(year, 12, 31))),
+                ("make_profit_line", (
+                    Path(f"graphs\\{year}\\Portfolio - Performance {year}.png"),
+                    date(year, 1, 1),
+                    date(year, 12, 31))),
+                ("make_scatterplot_daily_change", (
+                    Path(f"graphs\\{year}\\Veranderingen - Verhouding {year}.png"),
+                    date(year, 1, 1),
+                    date(year, 12, 31))),
+                ("make_histogram_plot", (
+                    Path(f"graphs\\{year}\\Veranderingen - Procentueel {year}.png"),
+                    "Dagelijks rendement(%)",
+                    date(year, 1, 1),
+                    date(year, 12, 31))),
+                ("make_histogram_plot", (
+                    Path(f"graphs\\{year}\\Veranderingen - Waarde {year}.png"),
+                    "Dagelijks rendement",
+                    date(year, 1, 1),
+                    date(year, 12, 31))),
+                ("make_purchases_plot", (
+                    Path(f"graphs\\{year}\\Transacties {year}.png"),
+                    year))]
+        return plots
+
+
+    def make_plots(self, workers=GRAPH_WORKERS):
+        print("Grafieken maken...")
+        plots = self.get_plots()
+
+        # The fingerprints of the saved graphs are kept, also when a later graph fails
+        try:
+            if workers <= 1:
+                for plot, args in plots:
+                    self.rendered[str(args[0])], stats = profiling.measure(getattr(self, plot), *args)
+                    profiling.add_detail(args[0].stem, stats)
+            else:
+                # Download the benchmark prices of the whole period once, before the graphs are divided over the workers
+                try:
+                    get_ticker_data(self.stats_df.index.min().date(), self.stats_df.index.max().date())
+                except Exception as e:
+                    print(e)
+
+                with ProcessPoolExecutor(max_workers=min(workers, len(plots)), initializer=start_worker, initargs=(self, ticker_data.prices)) as executor:
+                    # Every graph is made by itself, the first error is raised like when they are made one by one
+                    futures = {args[0]: executor.submit(make_plot, plot, args) for plot, args in plots}
+                    for plot_path, future in futures.items():
+                        self.rendered[str(plot_path)], stats = future.result()
+                        profiling.add_detail(plot_path.stem, stats)
+        finally:
+            self.save_manifest()
+
         print("Alle grafieken zijn opgeslagen!")
         print("Dit venster kan gesloten worden")
 
 
 if __name__ == "__main__":
+    freeze_support()
     DegiroGraphs().make_plots()
 
 
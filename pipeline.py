@@ -0,0 +1,135 @@
+from dataclasses import dataclass, field
+from pathlib import Path
+from hashlib import sha256
+from typing import Callable
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from time import perf_counter
+from os import replace
+import json
+
+import profiling
+
+
+PIPELINE_STATE = "data\\pipeline.json"     # Fingerprint of the files of every stage after its last run
+
+
+@dataclass
+class Stage:
+    name:str
+    run:Callable
+    inputs:list[str] = field(default_factory=list)      # Files or folders the stage reads
+    outputs:list[str] = field(default_factory=list)     # Files or folders the stage writes
+    period:str = ""         # Part of the fingerprint for stages that also depend on the date
+    always:bool = False     # The stage is run every time, it checks itself whether there is something to do
+    after:list[str] = field(default_factory=list)       # Stages that have to be finished first
+    mode:str = "main"       # "main" runs in this process, "process" in its own process for heavy work, "thread" for downloads
+
+
+def run_stage(stage:Stage):
+    # Runs in the process or thread of the stage, returns the measurements when profiling is on
+    return profiling.measure_stage(stage.run, stage.name)
+
+
+def get_files(path:str):
+    path = Path(path)
+    if path.is_dir():
+        return sorted(file for file in path.rglob("*") if file.is_file())
+    return [path]
+
+
+def get_fingerprint(stage:Stage):
+    # Name, size and modification time of every file, the files themselves are not read
+    fingerprint = sha256(stage.period.encode())
+    for path in stage.inputs + stage.outputs:
+        for file in get_files(path):
+            if file.exists():
+                stat = file.stat()
+                fingerprint.update(repr((str(file), stat.st_mtime_ns, stat.st_size)).encode())
+            else:
+                fingerprint.update(repr((str(file), None)).encode())
+    return fingerprint.hexdigest()
+
+
+class Pipeline():
+    def __init__(self, stages:list[Stage], state_path=PIPELINE_STATE):
+        self.stages = stages
+        self.state_path = Path(state_path)
+        self.report = {}
+        self.state = self.load_state()
+
+
+    def load_state(self):
+        # A state that can not be read is left out, then all stages are run again
+        try:
+            with open(self.state_path, "r") as file:
+                state = json.load(file)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            print(f"Waarschuwing: '{self.state_path}' is beschadigd, alle stappen worden opnieuw uitgevoerd.")
+            return {}
+        return state if isinstance(state, dict) else {}
+
+
+    def save_state(self):
+        # Written to a temporary file first, so a run that is stopped halfway never leaves half a state
+        with open(f"{self.state_path}.tmp", "w") as file:
+            json.dump(self.state, file, indent=4)
+        replace(f"{self.state_path}.tmp", self.state_path)
+
+
+    def is_up_to_date(self, stage:Stage, force:list[str]):
+        if stage.always or stage.name in force or "all" in force:
+            return False
+        return self.state.get(stage.name) == get_fingerprint(stage)
+
+
+    def run(self, force:list[str]=[]):
+        start = perf_counter()
+        try:
+            self.run_stages(force)
+        finally:
+            if profiling.enabled():
+                profiling.save_report(self.report, perf_counter() - start)
+
+
+    def run_stages(self, force:list[str]):
+        # A stage starts as soon as the stages it depends on are finished, stages that do not depend on each other run
+        # at the same time. A stage is skipped when its files did not change since its last run
+        waiting = list(self.stages)
+        finished = set()
+        running = {}
+        with ProcessPoolExecutor(max_workers=max(len([stage for stage in self.stages if stage.mode == "process"]), 1)) as processes, \
+             ThreadPoolExecutor(max_workers=max(len([stage for stage in self.stages if stage.mode == "thread"]), 1)) as threads:
+            while waiting or running:
+                ready = [stage for stage in waiting if all(name in finished for name in stage.after)]
+                for stage in ready:
+                    waiting.remove(stage)
+                    if self.is_up_to_date(stage, force):
+                        print(f"Stap '{stage.name}' is al bijgewerkt.")
+                        self.report[stage.name] = "overgeslagen"
+                        finished.add(stage.name)
+                    elif stage.mode == "process":
+                        running[processes.submit(run_stage, stage)] = stage
+                    elif stage.mode == "thread":
+                        running[threads.submit(run_stage, stage)] = stage
+                    else:
+                        self.finish(stage, finished, run_stage(stage))
+                if ready:
+                    continue
+                if not running:
+                    raise Exception(f"Stappen {[stage.name for stage in waiting]} wachten op een stap die niet bestaat")
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    # An error stops the run, the stages that are already running are finished first
+                    stats = future.result()
+                    self.finish(running.pop(future), finished, stats)
+
+
+    def finish(self, stage:Stage, finished:set, stats:dict=None):
+        if stats:
+            self.report[stage.name] = stats
+        self.state[stage.name] = get_fingerprint(stage)
+        self.save_state()
+        finished.add(stage.name)
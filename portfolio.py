@@ -0,0 +1,137 @@
+from pandas import DataFrame, Series, read_csv, read_feather, concat, to_datetime
+from dataclasses import dataclass
+from datetime import date, datetime
+from pathlib import Path
+from functools import lru_cache
+
+
+# Keep all daily portfolio reports in one file as well, so they can be loaded with one read (requires pyarrow)
+PORTFOLIO_STORE = False
+STORE_PATH = "data\\portfolio.feather"
+
+REPORT_CACHE_SIZE = 256     # Number of parsed daily reports kept in memory
+
+STORE_COLUMNS = ["Datum", "Product", "Symbool/ISIN", "Aantal", "Slotkoers", "Lokale valuta", "Lokale waarde", "Waarde in EUR"]
+
+# Columns of a saved daily report, 'Aantal' uses a decimal point and 'Lokale waarde' also holds the currency
+REPORT_TYPES = {"Product": str, "Symbool/ISIN": str, "Aantal": str, "Slotkoers": float, "Lokale waarde": str, "Waarde in EUR": float}
+# Columns of a saved daily report that are needed for the values of a day
+SNAPSHOT_TYPES = {"Product": str, "Waarde in EUR": float}
+
+CASH_PRODUCT = "CASH & CASH FUND & FTX CASH"
+
+
+@dataclass
+class Snapshot:
+    values:Series       # Value in EUR per product, without the positions that are worth nothing
+    cash:float
+    total:float
+
+
+def read_report(path):
+    # The decimal commas are converted while reading, 'Lokale waarde' is split into currency and amount
+    report = read_csv(path, sep=";", decimal=",", usecols=list(REPORT_TYPES), dtype=REPORT_TYPES, float_precision="round_trip")
+    lokale_waarde = report["Lokale waarde"].str.split(" ")
+    return DataFrame(data={
+        "Product": report["Product"],
+        "Symbool/ISIN": report["Symbool/ISIN"],
+        "Aantal": report["Aantal"].astype(float),
+        "Slotkoers": report["Slotkoers"],
+        "Lokale valuta": lokale_waarde.str[0],
+        "Lokale waarde": lokale_waarde.str[-1].astype(float),
+        "Waarde in EUR": report["Waarde in EUR"]})
+
+
+def get_snapshot(report:DataFrame):
+    # The totals are added up in the order of the report, so they are the same as before to the last digit
+    waarde = report["Waarde in EUR"]
+    values = waarde[waarde != 0]
+    values.index = report["Product"][waarde != 0].str.replace(".", "", regex=False)
+    cash = waarde[report["Product"].str.contains(CASH_PRODUCT, regex=False)]
+    return Snapshot(values=values, cash=sum(cash.tolist()), total=sum(waarde.tolist()))
+
+
+def read_snapshot(datum:date):
+    # Only the columns of the snapshot are read and nothing is cached, a bad value in another column does not lose the day
+    date_formatted = datum.strftime("%d-%m-%Y")
+    if PORTFOLIO_STORE and date_formatted in get_store_reports():
+        return get_snapshot(get_store_reports()[date_formatted])
+    report = read_csv(f"data\\portfolio\\Portfolio {date_formatted}.csv", sep=";", decimal=",",
+                      usecols=list(SNAPSHOT_TYPES), dtype=SNAPSHOT_TYPES, float_precision="round_trip")
+    return get_snapshot(report)
+
+
+def read_portfolio_report(datum:date):
+    # The returned report is shared between callers and should not be changed
+    return load_portfolio_report(datum.strftime("%d-%m-%Y"))
+
+
+@lru_cache(maxsize=REPORT_CACHE_SIZE)
+def load_portfolio_report(date_formatted:str):
+    # A day that is not in the store yet is read from its daily report
+    if PORTFOLIO_STORE and date_formatted in get_store_reports():
+        return get_store_reports()[date_formatted]
+    return read_report(f"data\\portfolio\\Portfolio {date_formatted}.csv")
+
+
+store_reports = None
+
+def get_store_reports():
+    # The store is read once per run and only written by 'ophalen', so the stages that read it at the same time never write it
+    global store_reports
+    if store_reports is None:
+        portfolio = PortfolioStore().load()
+        store_reports = {datum.strftime("%d-%m-%Y"): report.drop("Datum", axis=1).reset_index(drop=True)
+                         for datum, report in portfolio.groupby("Datum")}
+    return store_reports
+
+
+class PortfolioStore():
+    def __init__(self, path=STORE_PATH):
+        self.path = Path(path)
+
+
+    def load(self, start_date:date=None, end_date:date=None):
+        if not self.path.exists():
+            return DataFrame(columns=STORE_COLUMNS).astype({"Datum": "datetime64[ns]"})
+
+        portfolio = read_feather(self.path)
+        if start_date:
+            portfolio = portfolio[portfolio["Datum"] >= datetime.combine(start_date, datetime.min.time())]
+        if end_date:
+            portfolio = portfolio[portfolio["Datum"] <= datetime.combine(end_date, datetime.min.time())]
+        return portfolio.reset_index(drop=True)
+
+
+    def update(self):
+        # Add the daily reports that are not yet in the store
+        portfolio = self.load()
+        stored_dates = set(portfolio["Datum"].dt.strftime("%d-%m-%Y"))
+
+        reports = []
+        for report_path in Path("data\\portfolio").glob("Portfolio *.csv"):
+            date_formatted = report_path.stem.split(" ")[-1]
+            if date_formatted in stored_dates:
+                continue
+            try:
+                report = read_report(report_path)
+            except Exception as e:
+                print(f"Waarschuwing: '{report_path.name}' kon niet gelezen worden: {e}")
+                continue
+            report.insert(0, "Datum", datetime.strptime(date_formatted, "%d-%m-%Y"))
+            reports.append(report)
+
+        if len(reports) == 0:
+            return portfolio
+
+        portfolio = concat([portfolio] + reports, ignore_index=True) if len(portfolio) else concat(reports, ignore_index=True)
+        portfolio["Datum"] = to_datetime(portfolio["Datum"])
+        portfolio = portfolio.sort_values("Datum", kind="stable").reset_index(drop=True)
+        portfolio.to_feather(self.path)
+        print(f"{len(reports)} dagverslagen toegevoegd aan '{self.path}'")
+        return portfolio
+
+
+if __name__ == "__main__":
+    print("Dagverslagen importeren...")
+    PortfolioStore().update()
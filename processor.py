@@ -1,5 +1,15 @@
-from pandas import read_csv, DataFrame, to_numeric
+from pandas import read_csv, DataFrame, to_numeric, to_datetime, concat, date_range
+from pandas.util import hash_pandas_object
 from datetime import datetime, timedelta
+from pathlib import Path
+from sys import argv
+from re import escape
+from os import cpu_count
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import freeze_support
+import json
+
+from portfolio import PORTFOLIO_STORE, read_snapshot
 
 
 STORTING_TRANSACTIES = [
@@ -11,15 +21,51 @@ STORTING_TRANSACTIES = [
     "Processed Flatex Withdrawal",
     "flatex terugstorting"]
 
+STATE_PATH = "data\\processor.json"
+
+PROCESS_WORKERS = cpu_count() or 1     # Processes that read the daily reports when many days are processed, 1 reads them one by one
+BACKFILL_SHARD_DAYS = 90    # Days of daily reports read by a process at a time
+
 
 def safe_division(x, y):
     return x / y if y else 0
 
 
+def read_snapshots(dates:list[datetime]):
+    # Read a range of daily reports, a report that can not be read gives the error instead
+    snapshots = []
+    for date in dates:
+        try:
+            snapshots.append(read_snapshot(date))
+        except Exception as e:
+            snapshots.append(Exception(str(e)))
+    return snapshots
+
+
+def read_all_snapshots(dates:list[datetime], workers:int):
+    # Every process reads a shard of days, the results are put back in the order of the days
+    shards = [dates[i:i + BACKFILL_SHARD_DAYS] for i in range(0, len(dates), BACKFILL_SHARD_DAYS)]
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+        snapshots = [snapshot for shard in executor.map(read_snapshots, shards) for snapshot in shard]
+    return dict(zip(dates, snapshots))
+
+
+def pivot_values(dates:list, values:dict):
+    # Turn the long (date, product, value) buffer into one row per date and one column per product
+    values_df = DataFrame(data=values)
+    values_df["Waarde"] = to_numeric(values_df["Waarde"], errors="coerce")
+    values_df = values_df.drop_duplicates(["Datum", "Product"], keep="last")
+    values_df = values_df.pivot(index="Datum", columns="Product", values="Waarde")
+    values_df = values_df.reindex(index=dates, columns=list(dict.fromkeys(values["Product"])))
+    values_df.insert(0, "Datum", dates)
+    return values_df.reset_index(drop=True).rename_axis(None, axis=1)
+
+
 class DegiroProcessor():
     def __init__(self) -> None:
         self.cash_report = read_csv("data\\cash.csv", sep=";")
         self.transactions_report = read_csv("data\\transactions.csv", sep=";")
+        self.cash_totals = self.index_cash_report()
 
 
     def get_start_date(self):
@@ -28,49 +74,96 @@ class DegiroProcessor():
         return min(cash_report_start, transaction_report_start)
 
 
-    def process_stats(self):
-        print("Verslagen verwerken...")
-        start_date = self.get_start_date()
-        date = start_date
+    def index_cash_report(self):
+        # Classify every cash entry once and keep the running deposited and costs totals per day
+        cash_report = self.cash_report.assign(Datum=to_datetime(self.cash_report["Datum"], format="%d-%m-%Y"))
+        cash_report = cash_report.sort_values("Datum", kind="stable")
+
+        omschrijving = cash_report["Omschrijving"].fillna("")
+        costs_mask = omschrijving.str.lower().str.contains("transactiekosten", regex=False)
+        deposit_mask = ~costs_mask & omschrijving.str.contains("|".join(escape(transactie) for transactie in STORTING_TRANSACTIES))
+
+        cash_totals = DataFrame(data={
+            "Datum": cash_report["Datum"],
+            "Inleg": cash_report["Unnamed: 8"].where(deposit_mask, 0).cumsum(),
+            "Kosten": cash_report["Unnamed: 8"].where(costs_mask, 0).cumsum()})
+        cash_totals = cash_totals.groupby("Datum").last()
+        return cash_totals.reindex(date_range(self.get_start_date(), datetime.now()), method="ffill").fillna(0)
+
+
+    def get_cash_hash(self, date):
+        # Fingerprint of all cash entries before date, to detect changes in already processed days
+        dates = to_datetime(self.cash_report["Datum"], format="%d-%m-%Y")
+        return str(hash_pandas_object(self.cash_report[dates < date], index=False).sum())
+
 
-        deposited = 0
-        costs = 0
-        previous_result = 0
+    def load_state(self):
+        if not Path(STATE_PATH).exists() or not Path("Degiro - Waarde.csv").exists() or not Path("Degiro - Rendement.csv").exists():
+            return None
+        try:
+            with open(STATE_PATH, "r") as file:
+                state = json.load(file)
+            state["datum"] = datetime.strptime(state["datum"], "%d-%m-%Y")
+        except Exception as e:
+            print(e)
+            return None
 
-        values_df = DataFrame(columns=["Datum"])
+        if state["cash"] != self.get_cash_hash(state["datum"]):
+            print("Rekeningoverzicht is gewijzigd, alle verslagen worden opnieuw verwerkt.")
+            return None
+        return state
+
+
+    def save_state(self, state):
+        state = state | {"datum": state["datum"].strftime("%d-%m-%Y"), "cash": self.get_cash_hash(state["datum"])}
+        with open(STATE_PATH, "w") as file:
+            json.dump(state, file)
+
+
+    def process_stats(self, full_rebuild=False, workers=PROCESS_WORKERS):
+        print("Verslagen verwerken...")
+        state = None if full_rebuild else self.load_state()
+        incremental = state is not None
+        if incremental:
+            date = state["datum"]
+            previous_result = state["previous_result"]
+        else:
+            date = self.get_start_date()
+            previous_result = 0
+
+        # With many days to process, like a rebuild, the reports are read in parallel first and then processed in order
+        snapshots = {}
+        dates = [dag.to_pydatetime() for dag in date_range(date, datetime.now() - timedelta(1), inclusive="left")]
+        if workers > 1 and len(dates) > BACKFILL_SHARD_DAYS and not PORTFOLIO_STORE:
+            snapshots = read_all_snapshots(dates, workers)
+
+        value_dates = []
+        values = {"Datum": [], "Product": [], "Waarde": []}
         stats = []
         while date < datetime.now() - timedelta(1):
             try:
                 date_formatted = date.strftime("%d-%m-%Y")
 
-                cash_transactions = self.cash_report[self.cash_report["Datum"] == date_formatted]
-                for cash_transaction in cash_transactions.itertuples():
-                    if "transactiekosten" in cash_transaction.Omschrijving.lower():
-                        costs += cash_transaction._9
-
-                    elif any(deposit_transaction in cash_transaction.Omschrijving for deposit_transaction in STORTING_TRANSACTIES):
-                        deposited += cash_transaction._9
+                # Python floats, so the values are rounded the same way as before
+                deposited = float(self.cash_totals.at[date, "Inleg"])
+                costs = float(self.cash_totals.at[date, "Kosten"])
 
                 try:
-                    value_report = read_csv(f"data\\portfolio\\Portfolio {date_formatted}.csv", sep=";")
+                    snapshot = snapshots[date] if date in snapshots else read_snapshot(date)
+                    if isinstance(snapshot, Exception):
+                        raise snapshot
                 except Exception as e:
                     date += timedelta(1)
                     print(e)
                     continue
 
-                values_day = {}
-                values_day["Datum"] = [date_formatted]
-                values_day["Datum_sort"] = [date]
-
-                for row in value_report.itertuples():
-                    if row._6 != "0,00":
-                        values_day[row.Product.replace(".", "")] = [row._6.replace(",", ".")]
+                value_dates.append(date_formatted)
+                values["Datum"] += [date_formatted] * len(snapshot.values)
+                values["Product"] += snapshot.values.index.tolist()
+                values["Waarde"] += snapshot.values.tolist()
 
-                values_df = values_df.merge(DataFrame.from_dict(values_day), how="outer")
-
-                cash_total = sum([float(row["Waarde in EUR"].replace(",", ".")) for index, row in value_report.iterrows() if "CASH & CASH FUND & FTX CASH" in row["Product"]])
-
-                value_total = sum([float(value.replace(",", ".")) for value in list(value_report["Waarde in EUR"])])
+                cash_total = snapshot.cash
+                value_total = snapshot.total
                 result_total = value_total - deposited - costs
                 result_percentage = safe_division(result_total, value_total - result_total) * 100
                 daily_result_total = result_total - previous_result
@@ -88,21 +181,35 @@ class DegiroProcessor():
                 ])
                 date += timedelta(1)
                 previous_result = result_total
-                
+                state = {"datum": date, "previous_result": float(previous_result)}
+
             except Exception as e:
                 date += timedelta(1)
                 print(e)
 
+        if len(stats) == 0:
+            print("Verslagen zijn al bijgewerkt!")
+            return
+
         stats_df = DataFrame(data=stats, columns=["Datum", "Waarde", "Inleg", "Kosten", "Rendement", "Rendement(%)", "Dagelijks rendement", "Dagelijks rendement(%)"])
-        # print(values_df.sort_values("Datum"))
-        for column in set(values_df.columns) - {"Datum"}:
-            values_df[column] = to_numeric(values_df[column], errors="coerce")
-        # print(values_df)
-        
-        values_df = values_df.sort_values("Datum_sort").drop("Datum_sort", axis=1)
-
-        values_df.to_csv("Degiro - Waarde.csv", sep=";", index=False, decimal=",")
+        values_df = pivot_values(value_dates, values)
+
+        if incremental:
+            # Only the new days are processed, add them to the existing reports
+            previous_values_df = read_csv("Degiro - Waarde.csv", sep=";", decimal=",", float_precision="round_trip")
+            values_df = concat([previous_values_df, values_df], ignore_index=True)
+            values_df.to_csv("Degiro - Waarde.csv", sep=";", index=False, decimal=",")
+            stats_df.to_csv("Degiro - Rendement.csv", sep=";", index=False, decimal=",", mode="a", header=False)
+        else:
+            values_df.to_csv("Degiro - Waarde.csv", sep=";", index=False, decimal=",")
+            stats_df.to_csv("Degiro - Rendement.csv", sep=";", index=False, decimal=",")
         print("Verslag 'Degiro - Waarde' opgeslagen!")
-        stats_df.to_csv("Degiro - Rendement.csv", sep=";", index=False, decimal=",")
         print("Verslag 'Degiro - Rendement' opgeslagen!")
 
+        self.save_state(state)
+
+
+if __name__ == "__main__":
+    freeze_support()
+    DegiroProcessor().process_stats(full_rebuild="--rebuild" in argv)
+
@@ -0,0 +1,139 @@
+from io import RawIOBase
+from time import perf_counter, process_time
+from datetime import datetime
+from threading import Lock
+import builtins
+import cProfile
+import json
+import os
+import tracemalloc
+
+
+PROFILE_PATH = "Degiro - Profiel.json"
+CPROFILE_PATH = "Degiro - Profiel - {name}.prof"
+# Set by degirotracker.py --profile, an environment variable so the stages in other processes also measure themselves
+PROFILE_VARIABLE = "DEGIRO_PROFILE"
+
+counters = {"files_read": 0, "bytes_downloaded": 0}
+counters_lock = Lock()
+details = {}    # Measurements of the parts of a stage, like every graph
+memory_blocks = []      # [memory at the start, highest memory before a nested measurement] of every running measurement
+tracing_started = False     # Memory tracing was started by the measurements, not by PYTHONTRACEMALLOC
+original_open = builtins.open
+
+
+def enabled():
+    return os.environ.get(PROFILE_VARIABLE) is not None
+
+
+def cprofile_enabled():
+    return os.environ.get(PROFILE_VARIABLE) == "cprofile"
+
+
+def add_count(counter:str, amount=1):
+    with counters_lock:
+        counters[counter] += amount
+
+
+def add_download(size:int):
+    add_count("bytes_downloaded", size)
+
+
+def counting_open(file, mode="r", *args, **kwargs):
+    if not any(character in mode for character in "wax+"):
+        add_count("files_read")
+    return original_open(file, mode, *args, **kwargs)
+
+
+class CountingReader(RawIOBase):
+    # Counts the bytes that are received from a response, wrap it in a BufferedReader to read it
+    def __init__(self, raw):
+        self.raw = raw
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = self.raw.readinto(buffer)
+        add_download(size or 0)
+        return size
+
+
+def start_memory():
+    # Memory is traced while measuring, the peak is reset for the new block, the blocks around it keep their peak so far
+    global tracing_started
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        tracing_started = True
+    current, peak = tracemalloc.get_traced_memory()
+    for block in memory_blocks:
+        block[1] = max(block[1], peak)
+    tracemalloc.reset_peak()
+    memory_blocks.append([current, 0])
+
+
+def stop_memory():
+    # Highest memory allocated by Python and numpy during the block, in bytes above the memory at its start
+    global tracing_started
+    _, peak = tracemalloc.get_traced_memory()
+    start, earlier_peak = memory_blocks.pop()
+    if not memory_blocks and tracing_started:
+        tracemalloc.stop()
+        tracing_started = False
+    return max(peak, earlier_peak) - start
+
+
+def measure(function, *args, name=None):
+    # Returns the result of the function with its measurements, or None when profiling is off
+    if not enabled():
+        return function(*args), None
+
+    # Files are counted while the function runs, nested measurements put back the open of the measurement around them
+    previous_open = builtins.open
+    builtins.open = counting_open
+    start_counters = dict(counters)
+    start_memory()
+    start_wall, start_cpu = perf_counter(), process_time()
+    profile = cProfile.Profile() if cprofile_enabled() and name else None
+    if profile:
+        profile.enable()
+    try:
+        result = function(*args)
+    finally:
+        peak_memory = stop_memory()
+        builtins.open = previous_open
+        if profile:
+            profile.disable()
+            profile.dump_stats(CPROFILE_PATH.format(name=name))
+
+    stats = {
+        "wall_time": round(perf_counter() - start_wall, 3),
+        "cpu_time": round(process_time() - start_cpu, 3),
+        "peak_memory": peak_memory,
+        "files_read": counters["files_read"] - start_counters["files_read"],
+        "bytes_downloaded": counters["bytes_downloaded"] - start_counters["bytes_downloaded"]}
+    return result, stats
+
+
+def add_detail(name:str, stats:dict):
+    if stats:
+        details[name] = stats
+
+
+def measure_stage(function, name:str):
+    # Measurements of a whole stage, with the measurements of its parts
+    details.clear()
+    _, stats = measure(function, name=name)
+    if stats and details:
+        stats["details"] = dict(details)
+    return stats
+
+
+def save_report(stages:dict, wall_time:float):
+    report = {
+        "datum": datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
+        "wall_time": round(wall_time, 3),
+        "stages": stages}
+    with open(PROFILE_PATH, "w") as file:
+        json.dump(report, file, indent=4)
+    print(f"Profiel opgeslagen in '{PROFILE_PATH}'")
@@ -1,20 +1,123 @@
-from io import StringIO
-from pandas import read_csv
+from pandas import read_csv, to_datetime, concat
 from datetime import datetime, timedelta
 from pathlib import Path
+from csv import reader, writer
+from os import linesep
+import re
 
 from http.client import HTTPSConnection
-from io import StringIO
+from io import TextIOWrapper, StringIO, BufferedReader
+from gzip import GzipFile
+from queue import LifoQueue, Empty
 from browser_cookie3 import chrome, firefox
-from os import _exit
+from os import _exit, replace, remove
 from pyuac import isUserAdmin, runAsAdmin
 from csv import QUOTE_NONNUMERIC
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from time import monotonic, sleep
+
+from portfolio import PORTFOLIO_STORE, PortfolioStore
+from profiling import CountingReader
+from retry import with_retries
 
 BASE_URL = "trader.degiro.nl"
 
+DOWNLOAD_WORKERS = 4        # Number of daily reports downloaded at the same time
+REQUESTS_PER_SECOND = 5     # Maximum number of requests to Degiro per second
+DOWNLOAD_RETRIES = 3        # Number of retries for a failed download
+SYNC_OVERLAP = 7            # Days of the cash and transaction reports that are downloaded again on every update
+
+
+# Values that pandas reads as missing
+NA_VALUES = {"", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+             "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null"}
+BOOLEAN_VALUES = {"True", "TRUE", "true", "False", "FALSE", "false"}
+INTEGER_PATTERN = re.compile(r"[+-]?[0-9]+")
+FLOAT_PATTERN = re.compile(r"[+-]?([0-9]+\.?[0-9]*|\.[0-9]+)([eE][+-]?[0-9]+)?|[+-]?inf(inity)?", re.IGNORECASE)
+
+
+def get_column_names(header:list[str]):
+    names = [column if column else f"Unnamed: {index}" for index, column in enumerate(header)]
+    columns = []
+    for index, column in enumerate(names):
+        duplicates = names[:index].count(column)
+        columns.append(f"{column}.{duplicates}" if duplicates else column)
+    if len(set(columns)) != len(columns):
+        raise ValueError("Kolomnamen worden anders verwerkt door pandas")
+    return columns
+
+
+def convert_column(values:list[str]):
+    # Same type inference as pandas.read_csv: integers, else floats, else text
+    present = [value for value in values if value not in NA_VALUES]
+    if any(value in BOOLEAN_VALUES or value != value.strip() for value in present):
+        raise ValueError("Kolom wordt anders verwerkt door pandas")
+    if any(len(re.sub(r"[eE].*|[^0-9]", "", value).lstrip("0")) > 15 and FLOAT_PATTERN.fullmatch(value) for value in present):
+        # pandas does not round numbers with more than 15 digits exactly, leave those to pandas
+        raise ValueError("Getal met te veel cijfers voor een exacte omzetting")
+    if len(present) == 0:
+        return [""] * len(values)
+    if all(INTEGER_PATTERN.fullmatch(value) for value in present):
+        if len(present) == len(values):
+            return [int(value) for value in values]
+        return ["" if value in NA_VALUES else float(int(value)) for value in values]
+    if all(FLOAT_PATTERN.fullmatch(value) for value in present):
+        return ["" if value in NA_VALUES else float(value) for value in values]
+    return ["" if value in NA_VALUES else value for value in values]
+
+
+def write_report(rows:list[list[str]], path):
+    header, rows = get_column_names(rows[0]), rows[1:]
+    if any(len(row) > len(header) for row in rows):
+        raise ValueError("Regel met meer kolommen dan de kop")
+
+    columns = [convert_column([row[index] if index < len(row) else "" for row in rows]) for index in range(len(header))]
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        csv_writer = writer(file, delimiter=";", quoting=QUOTE_NONNUMERIC, lineterminator=linesep)
+        csv_writer.writerow(header)
+        csv_writer.writerows(zip(*columns))
+
+
+def transcode_report(lines, path):
+    # Convert a report from Degiro's comma separated format to the saved format in one pass, the result is the same as
+    # read_csv(sep=",").to_csv(sep=";", index=False, quoting=QUOTE_NONNUMERIC) but without building a DataFrame
+    rows = [row for row in reader(lines) if row]
+    rows[0][0] = rows[0][0].removeprefix("\ufeff")
+    try:
+        write_report(rows, path)
+    except ValueError:
+        # Reports that pandas would read differently still go through pandas
+        data = StringIO()
+        writer(data).writerows(rows)
+        data.seek(0)
+        read_csv(data, sep=",").to_csv(path, sep=";", index=False, quoting=QUOTE_NONNUMERIC)
+
+
+class RateLimiter():
+    def __init__(self, rate:float):
+        self.interval = 1 / rate if rate else 0
+        self.next_request = monotonic()
+        self.lock = Lock()
+
+
+    def wait(self):
+        with self.lock:
+            now = monotonic()
+            wait = self.next_request - now
+            self.next_request = max(now, self.next_request) + self.interval
+        if wait > 0:
+            sleep(wait)
+
 
 class DegiroReciever():
-    def __init__(self):
+    def __init__(self, base_url=BASE_URL, connection=HTTPSConnection, workers=DOWNLOAD_WORKERS, rate=REQUESTS_PER_SECOND):
+        self.base_url = base_url
+        self.connection = connection
+        self.workers = workers
+        self.rate_limiter = RateLimiter(rate)
+        self.connections = LifoQueue()
+
         if not Path("data").exists():
             Path("data").mkdir()
         if not Path("data\\portfolio").exists():
@@ -38,22 +141,85 @@ class DegiroReciever():
         raise Exception("Geen verslagen kunnen ophalen. Controleer of je ingelogd bent op Degiro in Google Chrome!")
 
 
-    def get_report(self, report, date=None):
+    def get_report_url(self, report, date=None, from_date=datetime(2000, 1, 1)):
         if report == "positionReport":
             # print(date.strftime("%d-%m-%Y"))
             day, month, year = datetime.strftime(date, "%d-%m-%Y").split("-")
-            url = f"/portfolio-reports/secure/v3/{report}/csv?sessionId={self.session_id}&country=NL&lang=nl&toDate={day}/{month}/{year}"
-        else:
+            return f"/portfolio-reports/secure/v3/{report}/csv?sessionId={self.session_id}&country=NL&lang=nl&toDate={day}/{month}/{year}"
+
+        day, month, year = datetime.strftime(datetime.now(), "%d-%m-%Y").split("-")
+        from_day, from_month, from_year = datetime.strftime(from_date, "%d-%m-%Y").split("-")
+        return f"/portfolio-reports/secure/v3/{report}/csv?sessionId={self.session_id}&country=NL&lang=nl&fromDate={from_day}/{from_month}/{from_year}&toDate={day}/{month}/{year}"
+
+
+    def get_connection(self):
+        # Reuse an idle keep-alive connection, so not every report needs a new TLS handshake
+        try:
+            return self.connections.get_nowait()
+        except Empty:
+            return self.connection(self.base_url)
+
+
+    def close_connections(self):
+        while not self.connections.empty():
+            self.connections.get_nowait().close()
+
+
+    def download_report(self, report, path, date=None, from_date=datetime(2000, 1, 1)):
+        self.rate_limiter.wait()
+        conn = self.get_connection()
+        try:
+            conn.request("GET", self.get_report_url(report, date, from_date), headers={"Accept-Encoding": "gzip"})
+            res = conn.getresponse()
+            if res.status != 200:
+                res.read()
+                raise Exception(f"Degiro gaf status {res.status} bij het ophalen van '{report}'")
+
+            # The body is converted while it is received, without decoding it into one string first
+            received = BufferedReader(CountingReader(res))
+            body = GzipFile(fileobj=received) if res.getheader("Content-Encoding") == "gzip" else received
+            # Write to a temporary file first, so an interrupted download never leaves a partial report
+            transcode_report(TextIOWrapper(body, encoding="utf-8", newline=""), f"{path}.tmp")
+            res.read()
+        except Exception:
+            conn.close()
+            if Path(f"{path}.tmp").exists():
+                remove(f"{path}.tmp")
+            raise
+        self.connections.put(conn)
+        replace(f"{path}.tmp", path)
+
+
+    def get_report(self, report, path, date=None, from_date=datetime(2000, 1, 1)):
+        if report != "positionReport":
             print(f"Ophalen '{report}'...")
-            day, month, year = datetime.strftime(datetime.now(), "%d-%m-%Y").split("-")
-            url = f"/portfolio-reports/secure/v3/{report}/csv?sessionId={self.session_id}&country=NL&lang=nl&fromDate=01/01/2000&toDate={day}/{month}/{year}"
 
-        conn = HTTPSConnection(BASE_URL)
-        conn.request("GET", url, "", {})
+        return with_retries(self.download_report, report, path, date, from_date, retries=DOWNLOAD_RETRIES)
+
+
+    def sync_report(self, report, path):
+        # Only download the last days of the report and add them to the saved report
+        if not Path(path).exists():
+            return self.get_report(report, path)
+
+        saved_report = read_csv(path, sep=";")
+        if len(saved_report) == 0:
+            return self.get_report(report, path)
+        dates = to_datetime(saved_report["Datum"], format="%d-%m-%Y")
+
+        from_date = dates.max() - timedelta(SYNC_OVERLAP)
+        self.get_report(report, f"{path}.new", from_date=from_date)
+        new_report = read_csv(f"{path}.new", sep=";")
+        remove(f"{path}.new")
+
+        if list(new_report.columns) != list(saved_report.columns):
+            print(f"Indeling van '{report}' is gewijzigd, het hele verslag wordt opgehaald.")
+            return self.get_report(report, path)
 
-        res = conn.getresponse()
-        data = res.read().decode("utf-8")
-        return data
+        # The downloaded days replace the saved days from from_date onwards, so entries are never counted twice
+        report_df = concat([new_report, saved_report[dates < from_date]], ignore_index=True)
+        report_df.to_csv(f"{path}.tmp", sep=";", index=False, quoting=QUOTE_NONNUMERIC)
+        replace(f"{path}.tmp", path)
 
 
     def reports_up_to_date(self):
@@ -61,17 +227,41 @@ class DegiroReciever():
         return Path(f"data\\portfolio\\Portfolio {date_formatted}.csv").exists()
 
 
+    def save_portfolio_report(self, date):
+        date_string = datetime.strftime(date, "%d-%m-%Y")
+        self.get_report("positionReport", f"data\\portfolio\\Portfolio {date_string}.csv", date)
+
+
     def save_portfolio_reports(self, date):
         print("Ophalen dagverslagen...\n")
+        dates = []
         while date < datetime.now() - timedelta(1):
             date_string = datetime.strftime(date, "%d-%m-%Y")
             if not Path(f"data\\portfolio\\Portfolio {date_string}.csv").exists():
-                data = self.get_report("positionReport", date)
-                portfolio_report = read_csv(StringIO(data), sep=",")  
-                portfolio_report.to_csv(f"data\\portfolio\\Portfolio {date_string}.csv", sep=";", index=False, quoting=QUOTE_NONNUMERIC)
-
+                dates.append(date)
             date += timedelta(1)
 
+        # The most recent report marks the reports as up to date, so it is only saved when all others succeeded
+        last_date = dates.pop() if dates else None
+
+        with ThreadPoolExecutor(max_workers=max(self.workers, 1)) as executor:
+            futures = {date: executor.submit(self.save_portfolio_report, date) for date in dates}
+
+        failed = 0
+        for date, future in futures.items():
+            if future.exception():
+                print(f"Dagverslag van {date.strftime('%d-%m-%Y')} kon niet opgehaald worden: {future.exception()}")
+                failed += 1
+
+        if last_date and not failed:
+            self.save_portfolio_report(last_date)
+
+        if PORTFOLIO_STORE:
+            PortfolioStore().update()
+
+        if failed:
+            raise Exception(f"{failed} dagverslagen konden niet opgehaald worden. Probeer het later opnieuw.")
+
 
     def save_reports(self):
         if self.reports_up_to_date():
@@ -79,18 +269,17 @@ class DegiroReciever():
         
         print("Ophalen verslagen...")
         self.session_id = self.get_session()
-        # Transaction report
-        data = self.get_report("transactionReport")
-        report = read_csv(StringIO(data), sep=",")
-        report.to_csv(f"data\\transactions.csv", sep=";", index=False, quoting=QUOTE_NONNUMERIC)
-
-        # Cash report
-        data = self.get_report("cashAccountReport")
-        report = read_csv(StringIO(data), sep=",")  
-        report.to_csv(f"data\\cash.csv", sep=";", index=False, quoting=QUOTE_NONNUMERIC)
-
-        # Portfolio reports
-        self.save_portfolio_reports(self.get_start_date())
+        try:
+            # Transaction report
+            self.sync_report("transactionReport", "data\\transactions.csv")
+
+            # Cash report
+            self.sync_report("cashAccountReport", "data\\cash.csv")
+
+            # Portfolio reports
+            self.save_portfolio_reports(self.get_start_date())
+        finally:
+            self.close_connections()
 
 
     def get_start_date(self):
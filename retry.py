@@ -0,0 +1,15 @@
+from time import sleep
+
+
+RETRY_BACKOFF = 1       # Seconds to wait before the first retry, doubled every retry
+
+
+def with_retries(function, *args, retries:int, errors=(Exception,)):
+    # Calls the function until it succeeds, the error of the last attempt is raised
+    for attempt in range(retries + 1):
+        try:
+            return function(*args)
+        except errors:
+            if attempt == retries:
+                raise
+            sleep(RETRY_BACKOFF * 2 ** attempt)
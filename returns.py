@@ -0,0 +1,19 @@
+import pandas as pd
+import numpy as np
+
+
+def compound(returns:pd.Series, start=1):
+    # Value after every day when start grows with the daily returns, multiplied in order like a day by day loop
+    values = np.cumprod(np.concatenate([[start], 1 + returns.to_numpy(dtype=float)]))[1:]
+    return pd.Series(data=values, index=returns.index)
+
+
+def performance(returns:pd.Series):
+    # Cumulative performance in % since the first day
+    return compound(returns, 100) - 100
+
+
+def yearly_returns(returns:pd.Series):
+    # Compounded return of every year in one pass, for daily returns on a DatetimeIndex
+    growth = (1 + returns).groupby(returns.index.year).cumprod()
+    return growth.groupby(returns.index.year).last()
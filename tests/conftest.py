@@ -0,0 +1,41 @@
+from http.server import ThreadingHTTPServer
+from pathlib import Path
+from threading import Thread
+from types import ModuleType
+import sys
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+# browser_cookie3 and pyuac only work on Windows, the tests never log in so an empty module is enough elsewhere
+try:
+    import browser_cookie3
+except ImportError:
+    browser_cookie3 = ModuleType("browser_cookie3")
+    browser_cookie3.chrome = browser_cookie3.firefox = lambda **kwargs: []
+    sys.modules["browser_cookie3"] = browser_cookie3
+try:
+    import pyuac
+except ImportError:
+    pyuac = ModuleType("pyuac")
+    pyuac.isUserAdmin = lambda: True
+    pyuac.runAsAdmin = lambda **kwargs: None
+    sys.modules["pyuac"] = pyuac
+
+
+@pytest.fixture
+def serve():
+    # Starts a local server with the given request handler, returns its "host:port"
+    servers = []
+
+    def start(handler):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        servers.append(server)
+        return f"127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,25 @@
+import pytest
+
+import graphs
+from degirotracker import get_stages
+
+
+def get_stage(stages, name):
+    return next(stage for stage in stages if stage.name == name)
+
+
+@pytest.mark.parametrize("force, full_rebuild", [([], False), (["grafieken"], False), (["verwerken"], True), (["all"], True)])
+def test_forced_processing_rebuilds(force, full_rebuild):
+    assert get_stage(get_stages(force), "verwerken").run.keywords == {"full_rebuild": full_rebuild}
+
+
+def test_graph_workers(monkeypatch):
+    calls = []
+    monkeypatch.setattr(graphs.DegiroGraphs, "__init__", lambda self: None)
+    monkeypatch.setattr(graphs.DegiroGraphs, "make_plots", lambda self, workers: calls.append(workers))
+
+    get_stage(get_stages(), "grafieken").run()
+    get_stage(get_stages(graph_workers=2), "grafieken").run()
+
+    assert calls == [graphs.GRAPH_WORKERS, 2]
+    assert graphs.GRAPH_WORKERS <= 4
@@ -0,0 +1,164 @@
+from datetime import date, datetime
+from unittest.mock import patch
+import locale
+import re
+
+import pytest
+
+try:
+    import dividend
+except locale.Error:
+    # Without the Dutch locale the months get the names of the current locale, the expected reports use the same names
+    with patch.object(locale, "setlocale"):
+        import dividend
+from dividend import DegiroDividend
+from portfolio import load_portfolio_report
+
+
+CASH_HEADER = '"Datum";"Tijd";"Valutadatum";"Product";"ISIN";"Omschrijving";"FX";"Mutatie";"Unnamed: 8";"Saldo";"Unnamed: 10";"Order Id"\n'
+PORTFOLIO_HEADER = '"Product";"Symbool/ISIN";"Aantal";"Slotkoers";"Lokale waarde";"Waarde in EUR"\n'
+
+# Cash report with the newest line first, like Degiro sends it
+CASH = [
+    ("18-06-2024", "APPLE INC", "US0378331005", "Dividend", "USD", 4.1),
+    ("18-06-2024", "APPLE INC", "US0378331005", "Dividendbelasting", "USD", -0.62),
+    ("15-05-2024", "APPLE INC", "US0378331005", "Dividend", "USD", 3.74),
+    ("15-05-2024", "APPLE INC", "US0378331005", "Dividendbelasting", "USD", -0.56),
+    ("15-05-2024", "UNILEVER", "GB00B10RZP78", "Dividend", "EUR", 2.36),
+    ("15-05-2024", "UNILEVER", "GB00B10RZP78", "Dividendbelasting", "EUR", -0.35),
+    ("02-05-2024", "ROYAL DUTCH SHELL", "GB00BP6MXD84", "Dividend", "USD", 1.93),
+    ("12-04-2024", "UNILEVER", "GB00B10RZP78", "Dividend", "EUR", 2.25),
+    ("15-02-2024", "APPLE INC", "US0378331005", "Dividend", "USD", 3.52),
+    ("15-02-2024", "APPLE INC", "US0378331005", "Dividendbelasting", "USD", -0.53),
+    ("11-12-2023", "UNILEVER", "GB00B10RZP78", "Dividend", "EUR", 2.2),
+    ("11-12-2023", "UNILEVER", "GB00B10RZP78", "Dividendbelasting", "EUR", -0.33),
+    ("01-12-2023", "", "", "iDEAL storting", "EUR", 500.0)]
+
+# Portfolio reports of some of the dividend days, a report without the stock makes it look at the day before
+PORTFOLIO = {
+    "10-12-2023": [("UNILEVER", "GB00B10RZP78", 20, "44,10", "EUR 882.00", "882,00")],
+    "11-12-2023": [("CASH & CASH FUND & FTX CASH (USD)", "", "", "", "USD 12.40", "11,47")],
+    "14-02-2024": [("APPLE INC", "US0378331005", 10, "184,15", "USD 1841.50", "1708,97"),
+                   ("UNILEVER", "GB00B10RZP78", 20, "45,80", "EUR 916.00", "916,00")],
+    "12-04-2024": [("APPLE INC", "US0378331005", 10, "176,55", "USD 1765.50", "1649,53"),
+                   ("UNILEVER", "GB00B10RZP78", 20, "47,02", "EUR 940.40", "940,40")],
+    "02-05-2024": [("APPLE INC", "US0378331005", 10, "173,03", "USD 1730.30", "1611,89"),
+                   ("ROYAL DUTCH SHELL", "GB00BP6MXD84", 15, "33,41", "EUR 501.15", "501,15")],
+    "15-05-2024": [("CASH & CASH FUND & FTX CASH (USD)", "", "", "", "USD 20.00", "18,41"),
+                   ("APPLE INC", "US0378331005", 10, "189,72", "USD 1897.20", "1746,84"),
+                   ("UNILEVER", "GB00B10RZP78", 21, "48,12", "EUR 1010.52", "1010,52")],
+    "18-06-2024": [("APPLE INC", "US0378331005", 10, "214,29", "USD 2142.90", "2001,40")]}
+
+# Reports of the code before the reports were made in one pass, the months are filled in by month number
+OVERZICHT = """Datum;Product;Dividend;Percentage;Belasting
+2024-06-18;APPLE INC;3,25;0,162;0,579
+2024-05-15;APPLE INC;2,928;0,168;0,516
+2024-05-15;UNILEVER;2,01;0,199;0,35
+2024-05-02;ROYAL DUTCH SHELL;1,798;0,359;0,0
+2024-04-12;UNILEVER;2,25;0,239;0,0
+2024-02-15;APPLE INC;2,99;0,849;0,53
+2023-12-11;UNILEVER;1,87;0,212;0,33
+"""
+TOTAAL = """Jaar;Maand;UNILEVER;APPLE INC;ROYAL DUTCH SHELL
+2023;{12};1,87;;
+2024;{4};4,12;2,99;
+2024;{2};1,87;2,99;
+2024;{1};1,87;;
+2024;{6};6,13;9,168;1,798
+2024;{3};1,87;2,99;
+2024;{5};6,13;5,918;1,798
+"""
+BETALINGEN = """Jaar;Maand;Dividendbelasting;UNILEVER;APPLE INC;ROYAL DUTCH SHELL
+2023;{12};0,33;1,87;;
+2024;{4};0,0;2,25;;
+2024;{2};0,53;;2,99;
+2024;{6};0,579;;3,25;
+2024;{5};0,866;2,01;2,928;1,798
+Totaal;;2,304678115444649;6,13;9,168;1,798
+"""
+
+# Only dividends of the current month, which are not in the totals yet
+OVERZICHT_JUNI = """Datum;Product;Dividend;Percentage;Belasting
+2024-06-18;APPLE INC;3,25;0,162;0,579
+"""
+TOTAAL_JUNI = """Jaar;Maand
+"""
+BETALINGEN_JUNI = """Jaar;Maand;Dividendbelasting
+Totaal;;0
+"""
+
+TODAY = datetime(2024, 6, 20, 12)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return TODAY
+
+
+def fill_months(report:str):
+    return re.sub(r"\{(\d+)\}", lambda month: date(2000, int(month[1]), 1).strftime("%B"), report)
+
+
+def write_reports(cash:list, portfolio:dict):
+    with open("data\\cash.csv", "w") as file:
+        file.write(CASH_HEADER)
+        for datum, product, isin, omschrijving, valuta, amount in cash:
+            file.write(f'"{datum}";"09:00";"{datum}";"{product}";"{isin}";"{omschrijving}";"";"{valuta}";{amount};"{valuta}";0.0;""\n')
+
+    for datum, rows in portfolio.items():
+        with open(f"data\\portfolio\\Portfolio {datum}.csv", "w") as file:
+            file.write(PORTFOLIO_HEADER)
+            for product, isin, aantal, koers, lokaal, waarde in rows:
+                aantal = f"{float(aantal)}" if aantal != "" else '""'
+                file.write(f'"{product}";"{isin}";{aantal};"{koers}";"{lokaal}";"{waarde}"\n')
+
+
+@pytest.fixture
+def reports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(dividend, "datetime", FrozenDatetime)
+    load_portfolio_report.cache_clear()
+    yield
+    load_portfolio_report.cache_clear()
+
+
+def read(path):
+    with open(path) as file:
+        return file.read()
+
+
+def test_dividend_reports(reports):
+    write_reports(CASH, PORTFOLIO)
+    DegiroDividend().dividend_overview()
+
+    assert read("Degiro - Dividend - Overzicht.csv") == OVERZICHT
+    assert read("Degiro - Dividend - Totaal.csv") == fill_months(TOTAAL)
+    assert read("Degiro - Dividend - Betalingen.csv") == fill_months(BETALINGEN)
+
+
+def test_dividend_reports_current_month(reports):
+    write_reports([line for line in CASH if line[0].endswith("06-2024")], PORTFOLIO)
+    DegiroDividend().dividend_overview()
+
+    assert read("Degiro - Dividend - Overzicht.csv") == OVERZICHT_JUNI
+    assert read("Degiro - Dividend - Totaal.csv") == TOTAAL_JUNI
+    assert read("Degiro - Dividend - Betalingen.csv") == BETALINGEN_JUNI
+
+
+def test_exchange_rate_of_largest_position(reports):
+    # The dividend is paid in USD for a position in EUR, the exchange rate comes from the largest USD position. Compared
+    # as text '989,00' would come after '1708,97', the code before the reports were parsed took the cash as largest
+    write_reports([("10-06-2024", "SHELL PLC", "GB00BP6MXD84", "Dividend", "USD", 2.0),
+                   ("10-06-2024", "SHELL PLC", "GB00BP6MXD84", "Dividendbelasting", "USD", -0.3)],
+                  {"10-06-2024": [("CASH & CASH FUND & FTX CASH (USD)", "", "", "", "USD 1000.00", "989,00"),
+                                  ("APPLE INC", "US0378331005", 10, "185,00", "USD 1850.00", "1708,97"),
+                                  ("SHELL PLC", "GB00BP6MXD84", 15, "33,41", "EUR 501.15", "501,15")]})
+    DegiroDividend().dividend_overview()
+
+    exchange = 1850 / 1708.97
+    dividend_eur = (2.0 - 0.3) / exchange
+    assert read("Degiro - Dividend - Overzicht.csv") == (
+        "Datum;Product;Dividend;Percentage;Belasting\n"
+        f"2024-06-10;SHELL PLC;{round(dividend_eur, 3)};{round(dividend_eur / 501.15 * 100, 3)};{round(0.3 / exchange, 3)}\n"
+    ).replace(".", ",")
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+import graphs
+from graphs import DegiroGraphs, RENDER_MANIFEST
+
+
+@pytest.fixture
+def degiro_graphs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return DegiroGraphs.__new__(DegiroGraphs)
+
+
+def test_manifest_saved_and_loaded(degiro_graphs):
+    degiro_graphs.rendered = {"graphs\\Waarde.png": "abc"}
+    degiro_graphs.save_manifest()
+
+    assert degiro_graphs.load_manifest() == {"graphs\\Waarde.png": "abc"}
+    with open(RENDER_MANIFEST) as file:
+        assert json.load(file) == {"graphs\\Waarde.png": "abc"}
+
+
+@pytest.mark.parametrize("content", ['{"graphs\\\\Waarde.png": "ab', '', '[]'])
+def test_damaged_manifest_makes_all_graphs(degiro_graphs, content):
+    with open(RENDER_MANIFEST, "w") as file:
+        file.write(content)
+
+    assert degiro_graphs.load_manifest() == {}
+
+
+def test_missing_manifest(degiro_graphs):
+    assert degiro_graphs.load_manifest() == {}
+
+
+def test_failed_save_keeps_manifest(degiro_graphs, monkeypatch):
+    degiro_graphs.rendered = {"graphs\\Waarde.png": "abc"}
+    degiro_graphs.save_manifest()
+
+    def dump_partly(data, file, **kwargs):
+        file.write('{"graphs')
+        raise OSError("Schijf vol")
+
+    monkeypatch.setattr(graphs.json, "dump", dump_partly)
+    with pytest.raises(OSError):
+        degiro_graphs.save_manifest()
+
+    assert degiro_graphs.load_manifest() == {"graphs\\Waarde.png": "abc"}
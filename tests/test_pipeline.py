@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+import pipeline
+from pipeline import Pipeline, Stage, PIPELINE_STATE
+
+
+@pytest.fixture
+def stages(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "cash.csv").write_text("Datum")
+    runs = []
+    return runs, [Stage("verwerken", lambda: runs.append("verwerken"), inputs=["cash.csv"])]
+
+
+def test_unchanged_stage_is_skipped(stages):
+    runs, stage_list = stages
+    Pipeline(stage_list).run()
+    Pipeline(stage_list).run()
+
+    assert runs == ["verwerken"]
+    with open(PIPELINE_STATE) as file:
+        assert list(json.load(file)) == ["verwerken"]
+
+
+@pytest.mark.parametrize("content", ['{"verwerken": "ab', '', '[]'])
+def test_damaged_state_runs_all_stages(stages, content):
+    runs, stage_list = stages
+    Pipeline(stage_list).run()
+    with open(PIPELINE_STATE, "w") as file:
+        file.write(content)
+
+    Pipeline(stage_list).run()
+
+    assert runs == ["verwerken", "verwerken"]
+
+
+def test_failed_save_keeps_state(stages, monkeypatch):
+    runs, stage_list = stages
+    Pipeline(stage_list).run()
+
+    def dump_partly(data, file, **kwargs):
+        file.write('{"verwerken')
+        raise OSError("Schijf vol")
+
+    dump = pipeline.json.dump
+    monkeypatch.setattr(pipeline.json, "dump", dump_partly)
+    with pytest.raises(OSError):
+        Pipeline(stage_list).run(force=["verwerken"])
+    monkeypatch.setattr(pipeline.json, "dump", dump)
+
+    # The state of the previous run is still there, so the stage is not run again
+    Pipeline(stage_list).run()
+    assert runs == ["verwerken", "verwerken"]
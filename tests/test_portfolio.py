@@ -0,0 +1,90 @@
+from datetime import date
+from pathlib import Path
+
+import pytest
+from pandas import to_datetime
+
+import portfolio
+from portfolio import STORE_PATH, get_snapshot, load_portfolio_report, read_portfolio_report, read_report, read_snapshot
+
+
+REPORT = ('"Product";"Symbool/ISIN";"Aantal";"Slotkoers";"Lokale waarde";"Waarde in EUR"\n'
+          '"CASH & CASH FUND & FTX CASH (EUR)";"";"";"";"EUR 432.75";"432,75"\n'
+          '"CASH & CASH FUND & FTX CASH (USD)";"";"";"";"USD 98.21";"89,28"\n'
+          '"APPLE INC";"US0378331005";17.0;"{slotkoers}";"USD 2923.95";"2658,14"\n'
+          '"ASML HOLDING N.V.";"NL0010273215";2.0;"612,40";"EUR 1224.80";"1224,80"\n'
+          '"UNILEVER";"GB00B10RZP78";0.0;"48,12";"EUR 0.00";"0,00"\n')
+
+
+@pytest.fixture
+def report_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return tmp_path / "data\\portfolio\\Portfolio 15-05-2024.csv"
+
+
+def assert_same(snapshot, expected):
+    assert snapshot.values.to_dict() == expected.values.to_dict()
+    assert (snapshot.cash, snapshot.total) == (expected.cash, expected.total)
+
+
+def test_snapshot_like_full_report(report_path):
+    report_path.write_text(REPORT.format(slotkoers="150,00"))
+
+    snapshot = read_snapshot(date(2024, 5, 15))
+
+    assert_same(snapshot, get_snapshot(read_report(report_path)))
+    assert snapshot.values.to_dict() == {"CASH & CASH FUND & FTX CASH (EUR)": 432.75, "CASH & CASH FUND & FTX CASH (USD)": 89.28,
+                                         "APPLE INC": 2658.14, "ASML HOLDING NV": 1224.8}
+    assert (snapshot.cash, snapshot.total) == (432.75 + 89.28, 432.75 + 89.28 + 2658.14 + 1224.8)
+
+
+def test_bad_value_in_other_column(report_path):
+    report_path.write_text(REPORT.format(slotkoers="n.v.t."))
+
+    with pytest.raises(ValueError):
+        read_report(report_path)
+    assert read_snapshot(date(2024, 5, 15)).total == 432.75 + 89.28 + 2658.14 + 1224.8
+
+
+def test_snapshot_from_store(report_path, monkeypatch):
+    report_path.write_text(REPORT.format(slotkoers="150,00"))
+    monkeypatch.setattr(portfolio, "PORTFOLIO_STORE", True)
+    monkeypatch.setattr(portfolio, "store_reports", {"15-05-2024": read_report(report_path)})
+    expected = read_snapshot(date(2024, 5, 15))
+
+    # The store is used when it has the day, otherwise the daily report is read
+    report_path.write_text(REPORT.format(slotkoers="n.v.t.").replace("2658,14", "1,00"))
+    assert_same(read_snapshot(date(2024, 5, 15)), expected)
+    monkeypatch.setattr(portfolio, "store_reports", {})
+    assert read_snapshot(date(2024, 5, 15)).values["APPLE INC"] == 1.0
+
+
+@pytest.fixture
+def store(report_path, monkeypatch):
+    # Store with the day before the daily report, the reports are read again for every test
+    report_path.write_text(REPORT.format(slotkoers="150,00"))
+    stored = read_report(report_path).assign(**{"Waarde in EUR": 1.0})
+    stored.insert(0, "Datum", to_datetime("14-05-2024", format="%d-%m-%Y"))
+    stored.to_feather(STORE_PATH)
+    # A downloaded report that is not in the store yet, only 'ophalen' adds it
+    Path("data\\portfolio").mkdir(exist_ok=True)
+    (Path("data\\portfolio") / "Portfolio 13-05-2024.csv").write_text(REPORT.format(slotkoers="150,00"))
+    monkeypatch.setattr(portfolio, "PORTFOLIO_STORE", True)
+    monkeypatch.setattr(portfolio, "store_reports", None)
+    load_portfolio_report.cache_clear()
+    yield
+    load_portfolio_report.cache_clear()
+
+
+def test_reading_never_writes_the_store(store):
+    with open(STORE_PATH, "rb") as file:
+        saved = file.read()
+
+    assert read_portfolio_report(date(2024, 5, 14))["Waarde in EUR"].tolist() == [1.0] * 5
+    assert read_snapshot(date(2024, 5, 14)).total == 5.0
+    # A day that is not in the store yet comes from its daily report
+    assert read_portfolio_report(date(2024, 5, 15))["Waarde in EUR"].tolist() == [432.75, 89.28, 2658.14, 1224.8, 0.0]
+    assert read_snapshot(date(2024, 5, 15)).total == 432.75 + 89.28 + 2658.14 + 1224.8
+
+    with open(STORE_PATH, "rb") as file:
+        assert file.read() == saved
@@ -0,0 +1,106 @@
+from datetime import datetime
+
+import pytest
+
+import processor
+from processor import DegiroProcessor
+
+
+CASH_HEADER = '"Datum";"Tijd";"Valutadatum";"Product";"ISIN";"Omschrijving";"FX";"Mutatie";"Unnamed: 8";"Saldo";"Unnamed: 10";"Order Id"\n'
+TRANSACTIONS_HEADER = ('"Datum";"Tijd";"Product";"ISIN";"Beurs";"Uitvoeringsplaats";"Aantal";"Koers";"Unnamed: 8";"Lokale waarde";'
+                       '"Unnamed: 10";"Waarde";"Unnamed: 12";"Wisselkoers";"Transactiekosten en/of";"Unnamed: 15";"Totaal";"Unnamed: 17";"Order ID"\n')
+PORTFOLIO_HEADER = '"Product";"Symbool/ISIN";"Aantal";"Slotkoers";"Lokale waarde";"Waarde in EUR"\n'
+
+# Cash report with the newest line first, the amounts are rounded differently by numpy and Python
+CASH = [
+    ("06-03-2024", "APPLE INC", "Dividend", 3.5),
+    ("05-03-2024", "", "Terugstorting", -100.125),
+    ("02-03-2024", "APPLE INC", "DEGIRO Transactiekosten en/of kosten van derden", -2.675),
+    ("02-03-2024", "APPLE INC", "Koop 5 @ 180 USD", -900.0),
+    ("01-03-2024", "", "iDEAL storting", 1234.565)]
+
+TRANSACTIONS = [("02-03-2024", "APPLE INC", "US0378331005", 5, 180.0)]
+
+# Value in EUR of the cash and of the position on every day, there is no report of 04-03-2024
+PORTFOLIO = {
+    "01-03-2024": ("1234,57", None),
+    "02-03-2024": ("331,89", "828,11"),
+    "03-03-2024": ("331,89", "835,46"),
+    "05-03-2024": ("231,76", "0,00"),
+    "06-03-2024": ("235,26", "851,93"),
+    "07-03-2024": ("235,26", "849,17")}
+
+# Reports of the code that processed the days row by row
+WAARDE = """Datum;CASH & CASH FUND & FTX CASH (EUR);APPLE INC
+01-03-2024;1234,57;
+02-03-2024;331,89;828,11
+03-03-2024;331,89;835,46
+05-03-2024;231,76;
+06-03-2024;235,26;851,93
+07-03-2024;235,26;849,17
+"""
+RENDEMENT = """Datum;Waarde;Inleg;Kosten;Rendement;Rendement(%);Dagelijks rendement;Dagelijks rendement(%)
+01-03-2024;1234,57;1234,57;0,0;0,0;0,0;0,0;-100,0
+02-03-2024;1160,0;1234,57;-2,67;-71,89;-5,84;-71,89;-7,99
+03-03-2024;1167,35;1234,57;-2,67;-64,54;-5,24;7,35;0,89
+05-03-2024;231,76;1134,44;-2,67;-900,01;-79,52;-835,46;-100,0
+06-03-2024;1087,19;1134,44;-2,67;-44,58;-3,94;855,43;-24440,86
+07-03-2024;1084,43;1134,44;-2,67;-47,34;-4,18;-2,76;-0,32
+"""
+
+TODAY = datetime(2024, 3, 8, 12)
+
+
+class FrozenDatetime(datetime):
+    @classmethod
+    def now(cls, tz=None):
+        return TODAY
+
+
+@pytest.fixture
+def reports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(processor, "datetime", FrozenDatetime)
+    write_reports()
+
+
+def write_reports():
+    with open("data\\cash.csv", "w") as file:
+        file.write(CASH_HEADER)
+        for datum, product, omschrijving, amount in CASH:
+            file.write(f'"{datum}";"09:00";"{datum}";"{product}";"";"{omschrijving}";"";"EUR";{amount};"EUR";0.0;""\n')
+
+    with open("data\\transactions.csv", "w") as file:
+        file.write(TRANSACTIONS_HEADER)
+        for datum, product, isin, aantal, koers in TRANSACTIONS:
+            file.write(f'"{datum}";"09:00";"{product}";"{isin}";"NDQ";"XNAS";{aantal};{koers};"USD";{-aantal * koers};"USD";'
+                       f'-828.11;"EUR";1.0869;-2.0;"EUR";-830.11;"EUR";""\n')
+
+    for datum, (cash, apple) in PORTFOLIO.items():
+        with open(f"data\\portfolio\\Portfolio {datum}.csv", "w") as file:
+            file.write(PORTFOLIO_HEADER)
+            file.write(f'"CASH & CASH FUND & FTX CASH (EUR)";"";"";"";"EUR {cash.replace(",", ".")}";"{cash}"\n')
+            if apple:
+                file.write(f'"APPLE INC";"US0378331005";5.0;"180,00";"USD 900.00";"{apple}"\n')
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+def test_same_reports_as_row_by_row(reports):
+    DegiroProcessor().process_stats(full_rebuild=True, workers=1)
+
+    assert read("Degiro - Waarde.csv") == WAARDE.encode()
+    assert read("Degiro - Rendement.csv") == RENDEMENT.encode()
+
+
+def test_new_days_added_to_reports(reports, monkeypatch):
+    monkeypatch.setattr(FrozenDatetime, "now", classmethod(lambda cls, tz=None: datetime(2024, 3, 4, 12)))
+    DegiroProcessor().process_stats(workers=1)
+    monkeypatch.setattr(FrozenDatetime, "now", classmethod(lambda cls, tz=None: TODAY))
+    DegiroProcessor().process_stats(workers=1)
+
+    assert read("Degiro - Waarde.csv") == WAARDE.encode()
+    assert read("Degiro - Rendement.csv") == RENDEMENT.encode()
@@ -0,0 +1,79 @@
+import builtins
+import tracemalloc
+
+import pytest
+
+import profiling
+from profiling import PROFILE_VARIABLE, measure
+
+
+@pytest.fixture
+def profile(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv(PROFILE_VARIABLE, "profile")
+    (tmp_path / "report.csv").write_text("Datum")
+
+
+def read_report():
+    with open("report.csv") as file:
+        return file.read()
+
+
+def test_measure_counts_files_and_restores_open(profile):
+    original_open = builtins.open
+
+    result, stats = measure(read_report)
+
+    assert result == "Datum"
+    assert stats["files_read"] == 1
+    assert builtins.open is original_open
+
+
+def test_nested_measure(profile):
+    def read_reports():
+        _, stats = measure(read_report)
+        assert builtins.open is profiling.counting_open
+        return stats, read_report()
+
+    (inner, _), outer = measure(read_reports)
+
+    assert (inner["files_read"], outer["files_read"]) == (1, 2)
+
+
+def test_open_restored_after_error(profile):
+    original_open = builtins.open
+
+    def fail():
+        read_report()
+        raise ValueError("Kapot")
+
+    with pytest.raises(ValueError):
+        measure(fail)
+    assert builtins.open is original_open
+
+
+def allocate(size:int):
+    # The memory is freed again when the function returns
+    return len(bytearray(size))
+
+
+def test_peak_memory_of_every_block(profile):
+    _, large = measure(allocate, 20_000_000)
+    _, small = measure(allocate, 1_000_000)
+
+    assert large["peak_memory"] >= 20_000_000
+    assert 1_000_000 <= small["peak_memory"] < 20_000_000
+    assert not tracemalloc.is_tracing()
+
+
+def test_nested_peak_memory(profile):
+    def allocate_twice():
+        allocate(20_000_000)
+        _, stats = measure(allocate, 1_000_000)
+        return stats
+
+    inner, outer = measure(allocate_twice)
+
+    # The block around a measurement keeps the peak from before it
+    assert 1_000_000 <= inner["peak_memory"] < 20_000_000
+    assert outer["peak_memory"] >= 20_000_000
@@ -0,0 +1,162 @@
+from http.client import HTTPConnection
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import datetime, timedelta
+from threading import Lock
+from pathlib import Path
+from time import monotonic, sleep
+import gzip
+
+import pytest
+
+import reciever
+import retry
+from reciever import DegiroReciever
+
+
+def position_report(to_date:str):
+    return ('Product,Symbool/ISIN,Aantal,Slotkoers,Lokale waarde,Waarde in EUR\n'
+            'CASH & CASH FUND & FTX CASH (EUR),,,,EUR 10.00,"10,00"\n'
+            f'APPLE INC,US0378331005,3,"150,25",USD 450.75,"{to_date[:2]},50"\n')
+
+
+def saved_report(to_date:str):
+    return ('"Product";"Symbool/ISIN";"Aantal";"Slotkoers";"Lokale waarde";"Waarde in EUR"\n'
+            '"CASH & CASH FUND & FTX CASH (EUR)";"";"";"";"EUR 10.00";"10,00"\n'
+            f'"APPLE INC";"US0378331005";3.0;"150,25";"USD 450.75";"{to_date[:2]},50"\n')
+
+
+class DegiroServer():
+    # Stand-in for the report endpoints of Degiro, it keeps track of the requests it got
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.failures = 0       # Number of requests that get a status 500 first
+        self.truncate = False   # Close the connection halfway the body
+        self.times = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = Lock()
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with server.lock:
+                    server.times.append(monotonic())
+                    server.active += 1
+                    server.max_active = max(server.max_active, server.active)
+                    fail = server.failures > 0
+                    server.failures -= fail
+                try:
+                    sleep(server.delay)
+                    if fail:
+                        self.send_response(500)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                    to_date = parse_qs(urlparse(self.path).query)["toDate"][0]
+                    data = gzip.compress(position_report(to_date).encode())
+                    self.send_response(200)
+                    self.send_header("Content-Encoding", "gzip")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    if server.truncate:
+                        self.wfile.write(data[:len(data) // 2])
+                        self.close_connection = True
+                        return
+                    self.wfile.write(data)
+                finally:
+                    with server.lock:
+                        server.active -= 1
+
+        return Handler
+
+
+@pytest.fixture
+def degiro(serve, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(retry, "RETRY_BACKOFF", 0.05)
+    server = DegiroServer()
+    server.address = serve(server.handler())
+    return server
+
+
+def get_reciever(degiro, workers=4, rate=0):
+    degiro_reciever = DegiroReciever(base_url=degiro.address, connection=HTTPConnection, workers=workers, rate=rate)
+    degiro_reciever.session_id = "test"
+    return degiro_reciever
+
+
+def get_dates(days):
+    today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    return [today - timedelta(day) for day in range(days, 0, -1)]
+
+
+def test_parallel_downloads(degiro):
+    dates = get_dates(10)
+    get_reciever(degiro, workers=4).save_portfolio_reports(dates[0])
+
+    assert degiro.max_active > 1
+    assert len(degiro.times) == len(dates)
+    for date in dates:
+        date_string = date.strftime("%d-%m-%Y")
+        with open(f"data\\portfolio\\Portfolio {date_string}.csv", newline="") as file:
+            assert file.read().replace("\r\n", "\n") == saved_report(date_string)
+
+
+def test_retry_after_server_error(degiro, monkeypatch):
+    waits = []
+    monkeypatch.setattr(retry, "sleep", lambda seconds: waits.append(seconds))
+    degiro.failures = 2
+
+    get_reciever(degiro).save_portfolio_report(datetime(2024, 5, 3))
+
+    assert waits == [0.05, 0.1]
+    assert len(degiro.times) == 3
+    assert Path("data\\portfolio\\Portfolio 03-05-2024.csv").exists()
+
+
+def test_rate_limit(degiro):
+    degiro.delay = 0
+    rate = 10
+    get_reciever(degiro, workers=4, rate=rate).save_portfolio_reports(get_dates(8)[0])
+
+    # Requests never come closer together than the rate allows, also with several workers
+    times = sorted(degiro.times)
+    for index, time in enumerate(times):
+        assert time - times[0] >= index / rate - 0.01
+
+
+def test_failed_download_leaves_no_file(degiro, monkeypatch):
+    monkeypatch.setattr(reciever, "DOWNLOAD_RETRIES", 1)
+    degiro.truncate = True
+
+    with pytest.raises(Exception):
+        get_reciever(degiro).save_portfolio_report(datetime(2024, 5, 3))
+
+    assert len(degiro.times) == 2
+    assert list(Path().glob("*Portfolio*")) == []
+
+
+def test_failed_write_keeps_saved_report(degiro, monkeypatch):
+    path = Path("data\\portfolio\\Portfolio 03-05-2024.csv")
+    path.write_text("saved")
+
+    def write_partly(rows, path):
+        with open(path, "w") as file:
+            file.write("Product")
+        raise OSError("Schijf vol")
+
+    monkeypatch.setattr(reciever, "DOWNLOAD_RETRIES", 0)
+    monkeypatch.setattr(reciever, "write_report", write_partly)
+    with pytest.raises(OSError):
+        get_reciever(degiro).save_portfolio_report(datetime(2024, 5, 3))
+
+    assert path.read_text() == "saved"
+    assert not Path(f"{path}.tmp").exists()
@@ -0,0 +1,137 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from datetime import date, datetime, timedelta
+from pathlib import Path
+import json
+
+import pytest
+
+import retry
+import ticker_data
+from ticker_data import get_prices, get_ticker_values, get_timestamp
+
+
+def price(datum:date):
+    return round(100 + datum.toordinal() % 13 * 0.25, 2)
+
+
+class YahooServer():
+    # Stand-in for the chart API of Yahoo with a close for every day, it keeps the asked periods as dates
+    def __init__(self):
+        self.requests = []
+        self.truncate = False   # Send only the first half of the response
+
+    def handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                query = parse_qs(urlparse(self.path).query)
+                start = datetime.fromtimestamp(int(query["period1"][0])).date()
+                end = datetime.fromtimestamp(int(query["period2"][0])).date()
+                server.requests.append((urlparse(self.path).path.split("/")[-1], start, end))
+
+                dates = [start + timedelta(day) for day in range((end - start).days)]
+                body = json.dumps({"chart": {"result": [{
+                    "timestamp": [get_timestamp(datum) + 12 * 3600 for datum in dates],
+                    "indicators": {"quote": [{"close": [price(datum) for datum in dates]}]}}]}}).encode()
+                if server.truncate:
+                    body = body[:len(body) // 2]
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+@pytest.fixture
+def yahoo(serve, tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(ticker_data, "prices", {})
+    monkeypatch.setattr(retry, "RETRY_BACKOFF", 0)
+    server = YahooServer()
+    monkeypatch.setattr(ticker_data, "YAHOO_URL", f"http://{serve(server.handler())}")
+    return server
+
+
+def save_cache(start:date, end:date, ticker="TEST"):
+    Path("data\\tickers").mkdir()
+    values = {(start + timedelta(day)).strftime("%d-%m-%Y"): price(start + timedelta(day)) for day in range((end - start).days + 1)}
+    with open(f"data\\tickers\\{ticker}.json", "w") as file:
+        json.dump({"start": start.strftime("%d-%m-%Y"), "end": end.strftime("%d-%m-%Y"), "values": values}, file)
+
+
+def read_cache(ticker="TEST"):
+    with open(f"data\\tickers\\{ticker}.json") as file:
+        return json.load(file)
+
+
+def test_only_missing_dates_are_downloaded(yahoo):
+    save_cache(date(2024, 1, 1), date(2024, 1, 31))
+
+    values = get_prices(date(2023, 12, 20), date(2024, 2, 10), "TEST")
+
+    assert yahoo.requests == [("TEST", date(2023, 12, 20), date(2024, 1, 1)), ("TEST", date(2024, 2, 1), date(2024, 2, 11))]
+    assert values == {date(2023, 12, 20) + timedelta(day): price(date(2023, 12, 20) + timedelta(day)) for day in range(53)}
+    cache = read_cache()
+    assert (cache["start"], cache["end"], len(cache["values"])) == ("20-12-2023", "10-02-2024", 53)
+
+    # Everything is saved now, also after a restart
+    ticker_data.prices.clear()
+    assert get_prices(date(2024, 1, 5), date(2024, 2, 1), "TEST") == values
+    assert len(yahoo.requests) == 2
+
+
+def test_offline_uses_only_the_cache(yahoo, monkeypatch):
+    save_cache(date(2024, 1, 1), date(2024, 1, 31))
+    monkeypatch.setattr(ticker_data, "OFFLINE", True)
+    monkeypatch.setattr(ticker_data, "get_session", None)
+
+    values = get_prices(date(2023, 12, 1), date(2024, 3, 1), "TEST")
+
+    assert values == {date(2024, 1, 1) + timedelta(day): price(date(2024, 1, 1) + timedelta(day)) for day in range(31)}
+    assert yahoo.requests == []
+    with pytest.raises(Exception, match="Geen opgeslagen koersen"):
+        get_prices(date(2024, 1, 1), date(2024, 1, 31), "OTHER")
+
+
+@pytest.mark.parametrize("content", ['{"start": "01-01-2024", "end": "31-0', '[]', '{"start": "01-01-2024"}', ''])
+def test_damaged_cache_is_downloaded_again(yahoo, content, capsys):
+    Path("data\\tickers").mkdir()
+    with open("data\\tickers\\TEST.json", "w") as file:
+        file.write(content)
+
+    values = get_prices(date(2024, 1, 1), date(2024, 1, 31), "TEST")
+
+    assert "beschadigd" in capsys.readouterr().out
+    assert yahoo.requests == [("TEST", date(2024, 1, 1), date(2024, 2, 1))]
+    assert len(values) == 31
+    assert read_cache()["end"] == "31-01-2024"
+
+
+def test_damaged_cache_offline(yahoo, monkeypatch):
+    Path("data\\tickers").mkdir()
+    with open("data\\tickers\\TEST.json", "w") as file:
+        file.write('{"start": "01-01-2024", "end": "31-0')
+    monkeypatch.setattr(ticker_data, "OFFLINE", True)
+
+    with pytest.raises(Exception, match="Geen opgeslagen koersen"):
+        get_prices(date(2024, 1, 1), date(2024, 1, 31), "TEST")
+    assert yahoo.requests == []
+
+
+def test_partial_response_keeps_the_cache(yahoo, monkeypatch, capsys):
+    save_cache(date(2024, 1, 1), date(2024, 1, 31))
+    monkeypatch.setattr(ticker_data, "FETCH_RETRIES", 1)
+    yahoo.truncate = True
+
+    assert get_ticker_values(date(2024, 1, 11), date(2024, 2, 10), "TEST") == {}
+
+    assert "konden niet opgehaald worden" in capsys.readouterr().out
+    assert len(yahoo.requests) == 2
+    assert read_cache()["end"] == "31-01-2024"
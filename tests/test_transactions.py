@@ -0,0 +1,12 @@
+from unittest.mock import patch
+import locale
+import sys
+
+
+def test_sets_dutch_month_names(monkeypatch):
+    # The stage does not depend on the locale that another module sets when it is imported
+    monkeypatch.delitem(sys.modules, "transactions", raising=False)
+    with patch.object(locale, "setlocale") as setlocale:
+        import transactions
+
+    setlocale.assert_called_once_with(locale.LC_TIME, "nl_NL.UTF-8")
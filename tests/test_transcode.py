@@ -0,0 +1,72 @@
+from csv import QUOTE_NONNUMERIC
+from io import StringIO
+
+import pytest
+from pandas import read_csv
+
+import reciever
+from reciever import transcode_report
+
+
+# Reports in the comma separated format in which Degiro sends them
+PORTFOLIO = ('Product,Symbool/ISIN,Aantal,Slotkoers,Lokale waarde,Waarde in EUR\n'
+             'CASH & CASH FUND & FTX CASH (EUR),,,,EUR 432.75,"432,75"\n'
+             'CASH & CASH FUND & FTX CASH (USD),,,,USD 98.21,"89,28"\n'
+             'APPLE INC,US0378331005,17,"150,00",USD 2923.95,"2658,14"\n'
+             'VANGUARD FTSE ALL-WORLD,IE00BK5BQT80,4,"112,48",EUR 449.92,"449,92"\n')
+
+CASH = ('Datum,Tijd,Valutadatum,Product,ISIN,Omschrijving,FX,Mutatie,,Saldo,,Order Id\n'
+        '17-10-2026,11:00,17-10-2026,ASML HOLDING,NL0010273215,DEGIRO Transactiekosten en/of kosten van derden,,EUR,"-2,71",EUR,"998,00",5b1d6a8c-0c8e-4f2a\n'
+        '15-10-2026,07:30,14-10-2026,APPLE INC,US0378331005,Dividend,,USD,"3,74",USD,"3,74",\n'
+        '15-10-2026,07:30,14-10-2026,APPLE INC,US0378331005,Dividendbelasting,,USD,"-0,56",USD,"3,18",\n'
+        '02-10-2026,09:12,01-10-2026,,,iDEAL storting,,EUR,500,EUR,"1000,71",\n'
+        '01-10-2026,06:52,30-09-2026,,,Valuta Debitering,"1,0921",EUR,"-91,57",EUR,"500,71",\n')
+
+TRANSACTIONS = ('Datum,Tijd,Product,ISIN,Beurs,Uitvoeringsplaats,Aantal,Koers,,Lokale waarde,,Waarde,,Wisselkoers,'
+                'Transactiekosten en/of,,Totaal,,Order ID\n'
+                '17-10-2026,11:00,ASML HOLDING,NL0010273215,EAM,XAMS,1,"612,40",EUR,"-612,40",EUR,"-612,40",EUR,,"-2,00",EUR,"-614,40",EUR,5b1d6a8c\n'
+                '06-10-2026,15:31,APPLE INC,US0378331005,NDQ,XNAS,-2,"150,00",USD,"300,00",USD,"274,70",EUR,"1,0921","-2,00",EUR,"272,70",EUR,9c2e1f40\n')
+
+
+def pandas_report(text, path):
+    read_csv(StringIO(text), sep=",").to_csv(path, sep=";", index=False, quoting=QUOTE_NONNUMERIC)
+
+
+def transcode(text, path):
+    transcode_report(StringIO(text, newline=""), path)
+
+
+def read(path):
+    with open(path, "rb") as file:
+        return file.read()
+
+
+@pytest.mark.parametrize("text", [PORTFOLIO, CASH, TRANSACTIONS], ids=["portfolio", "cash", "transactions"])
+def test_reports_without_pandas(text, tmp_path, monkeypatch):
+    pandas_report(text, tmp_path / "pandas.csv")
+    # The reports of Degiro never need the fallback to pandas
+    monkeypatch.setattr(reciever, "read_csv", None)
+    transcode(text, tmp_path / "transcoded.csv")
+    assert read(tmp_path / "transcoded.csv") == read(tmp_path / "pandas.csv")
+
+
+@pytest.mark.parametrize("text", [
+    "a,b,c\nNA,null,1\nn/a,#N/A,2\n-nan,<NA>,NULL\nx,None,3\n",
+    "a,b\n1,2\n,3\n4,\n5,6\n",
+    "a,b\n-7,+8\n0,-0\n",
+    "a,b\n1234567890123456,1\n2,3\n",
+    "a,b\n0.1234567890123456789,1\n2.5,3\n",
+    "a,b\n1e400,1E-5\ninf,-Infinity\n",
+    "a,b,c\n1,2\n3\n4,5,6\n",
+    "\ufeffProduct,Aantal\nAPPLE INC,3\n",
+    "a,b\n١٢,３\n4,5\n",
+    "a,b\n٣.5,²\n1.5,2\n",
+    "a,b\nTrue,1\nFalse,2\n",
+    "a,b\n 1,2\n3 ,4\n",
+    "a,a,,\n1,2,3,4\n",
+], ids=["na", "int-gaps", "signs", "16-digits", "long-float", "exponent-inf", "short-rows", "bom", "unicode-digits",
+        "unicode-float", "booleans", "spaces", "duplicate-columns"])
+def test_edge_cases_like_pandas(text, tmp_path):
+    pandas_report(text, tmp_path / "pandas.csv")
+    transcode(text, tmp_path / "transcoded.csv")
+    assert read(tmp_path / "transcoded.csv") == read(tmp_path / "pandas.csv")
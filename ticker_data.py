@@ -1,57 +1,153 @@
 import requests
 from datetime import timedelta, datetime, date
+from pathlib import Path
+from os import getpid, replace
+import json
 import time
 import pandas as pd
 from functools import reduce
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 
+from returns import performance
+from profiling import add_download
+from retry import with_retries
 
-def get_prev_date(datum:date, values:dict):
-    if datum in values.keys():
-        return datum
-    return get_prev_date(datum - timedelta(1), values)
 
+YAHOO_URL = "https://query2.finance.yahoo.com"
+CACHE_PATH = "data\\tickers"
+OFFLINE = False     # Only use the saved prices, without downloading from Yahoo
 
-def get_data(start, end, ticker):
-    url = f"https://query2.finance.yahoo.com/v8/finance/chart/{ticker}?period1={start}&period2={end}&interval=1d&includePrePost=true&events=split"
-    res = requests.get(url, headers={"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate, br", "Accept": "*/*", "User-Agent": "Chrome/122.0.0.0"})
+# Benchmarks in the profit graphs, as legend name: Yahoo ticker
+BENCHMARKS = {
+    "S&P 500": "%5EGSPC",
+    "NASDAQ": "%5EIXIC",
+}
+FETCH_WORKERS = 8       # Number of tickers downloaded at the same time
+REQUEST_TIMEOUT = 10    # Seconds before a request to Yahoo is given up
+FETCH_RETRIES = 3       # Number of retries for a failed request
+
+prices = {}     # Prices per ticker that are already loaded in this run
+session = None     # Keep-alive connections to Yahoo, shared by all downloads
+
+
+def get_session():
+    global session
+    if session is None:
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_maxsize=FETCH_WORKERS))
+        session.mount("http://", HTTPAdapter(pool_maxsize=FETCH_WORKERS))
+        session.headers.update({"Accept-Encoding": "gzip, deflate", "Accept": "*/*", "User-Agent": "Chrome/122.0.0.0"})
+    return session
 
+
+def get_chart(url):
+    res = get_session().get(url, timeout=REQUEST_TIMEOUT)
+    res.raise_for_status()
     json_data = res.json()["chart"]["result"][0]
-    dates = [datetime.fromtimestamp(date).date() for date in json_data["timestamp"]]
-    values = json_data["indicators"]["quote"][0]["close"]
-    return {datum: value for datum, value in zip(dates, values)}
+    add_download(res.raw.tell())
+    return json_data
+
+
+def get_data(start, end, ticker):
+    url = f"{YAHOO_URL}/v8/finance/chart/{ticker}?period1={start}&period2={end}&interval=1d&includePrePost=true&events=split"
+    json_data = with_retries(get_chart, url, retries=FETCH_RETRIES, errors=(requests.RequestException, ValueError))
+
+    dates = [datetime.fromtimestamp(date).date() for date in json_data.get("timestamp", [])]
+    values = json_data["indicators"]["quote"][0].get("close", [])
+    return {datum: value for datum, value in zip(dates, values) if value is not None}
+
+
+def get_timestamp(datum:date):
+    return int(time.mktime(datum.timetuple()))
+
+
+def load_prices(ticker):
+    if ticker in prices:
+        return prices[ticker]
+
+    cache_file = Path(f"{CACHE_PATH}\\{ticker}.json")
+    if not cache_file.exists():
+        return None
+    try:
+        with open(cache_file, "r") as file:
+            cache = json.load(file)
+        prices[ticker] = {
+            "start": datetime.strptime(cache["start"], "%d-%m-%Y").date(),
+            "end": datetime.strptime(cache["end"], "%d-%m-%Y").date(),
+            "values": {datetime.strptime(datum, "%d-%m-%Y").date(): value for datum, value in cache["values"].items()}}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        # A damaged file is handled as if there are no saved prices, so they are downloaded again
+        print(f"Waarschuwing: Opgeslagen koersen van '{ticker}' zijn beschadigd en worden niet gebruikt.")
+        return None
+    return prices[ticker]
+
+
+def save_prices(ticker, cache):
+    prices[ticker] = cache
+    Path(CACHE_PATH).mkdir(exist_ok=True)
+    # Written to a file of this process first, so processes that save the same ticker never mix their files
+    with open(f"{CACHE_PATH}\\{ticker}.{getpid()}.tmp", "w") as file:
+        json.dump({
+            "start": cache["start"].strftime("%d-%m-%Y"),
+            "end": cache["end"].strftime("%d-%m-%Y"),
+            "values": {datum.strftime("%d-%m-%Y"): value for datum, value in sorted(cache["values"].items())}}, file)
+    replace(f"{CACHE_PATH}\\{ticker}.{getpid()}.tmp", f"{CACHE_PATH}\\{ticker}.json")
+
+
+def get_prices(start:date, end:date, ticker):
+    # Prices from the cache, only the dates that are not saved yet are downloaded
+    cache = load_prices(ticker)
+    if OFFLINE:
+        if cache is None:
+            raise Exception(f"Geen opgeslagen koersen van '{ticker}' gevonden")
+        return cache["values"]
+
+    # The prices of today can still change, those are never marked as complete
+    end = min(end, datetime.now().date() - timedelta(1))
+    if cache is None:
+        cache = {"start": start, "end": start - timedelta(1), "values": {}}
+    if start >= cache["start"] and end <= cache["end"]:
+        return cache["values"]
+
+    values = dict(cache["values"])
+    if start < cache["start"]:
+        values |= get_data(get_timestamp(start), get_timestamp(cache["start"]), ticker)
+    if end > cache["end"]:
+        values |= get_data(get_timestamp(cache["end"] + timedelta(1)), get_timestamp(end + timedelta(1)), ticker)
+
+    save_prices(ticker, {"start": min(start, cache["start"]), "end": max(end, cache["end"]), "values": values})
+    return values
 
 
 def get_tracking(start, end, values, ticker):
-    datum = start
-    tracked_data = {"Datum": [], ticker: []}
-    tracked = 100
-    while datum <= end:
-        date_formatted = datum.strftime("%d-%m-%Y")
-        if datum not in values.keys():
-            percentage = 0
-        else:
-            prev_datum = get_prev_date(datum - timedelta(1), values)
-            change = values[datum] - values[prev_datum]
-            percentage = change / values[prev_datum] * 100
-
-        tracked = tracked * (1 + percentage/100)
-
-        tracked_data["Datum"] = tracked_data["Datum"] + [date_formatted]
-        tracked_data[ticker] = tracked_data[ticker] + [tracked - 100]
-        datum += timedelta(1)
-    return pd.DataFrame(data=tracked_data)
-
-
-def get_ticker_data(start:date, end:date, tickers=["%5EGSPC", "%5EIXIC"]):
-    start_timestamp = int(time.mktime((start-timedelta(10)).timetuple()))
-    end_timestamp = int(time.mktime(end.timetuple()))
-
-    tracked_tickers = []
-    for ticker in tickers:
-        values = get_data(start_timestamp, end_timestamp, ticker)
-        tracked_data = get_tracking(start, end, values, ticker)
-        tracked_tickers.append(tracked_data)
+    # Daily change against the previous known close, days without a close do not change
+    closes = pd.Series(values, dtype=float)
+    closes.index = pd.to_datetime(closes.index)
+    closes = closes.sort_index()
+    dates = pd.date_range(start, end)
+    percentage = (closes.diff() / closes.shift() * 100).reindex(dates).fillna(0)
+
+    return pd.DataFrame(data={"Datum": dates.strftime("%d-%m-%Y"), ticker: performance(percentage / 100).to_numpy()})
+
+
+def get_ticker_values(start:date, end:date, ticker):
+    try:
+        # Yahoo is asked up to the start of the end date, so the close of that day itself is not used
+        return {datum: value for datum, value in get_prices(start - timedelta(10), end, ticker).items() if datum < end}
+    except Exception as e:
+        print(f"Waarschuwing: Koersen van '{ticker}' konden niet opgehaald worden: {e}")
+        return {}
 
+
+def get_ticker_data(start:date, end:date, tickers=BENCHMARKS.values()):
+    # All tickers are downloaded at the same time, a ticker that fails is shown as 0%
+    tickers = list(tickers)
+    get_session()
+    with ThreadPoolExecutor(max_workers=max(min(FETCH_WORKERS, len(tickers)), 1)) as executor:
+        ticker_values = list(executor.map(lambda ticker: get_ticker_values(start, end, ticker), tickers))
+
+    tracked_tickers = [get_tracking(start, end, values, ticker) for ticker, values in zip(tickers, ticker_values)]
     df_merged = reduce(lambda  left,right: pd.merge(left,right,on=['Datum'], how='outer'), tracked_tickers).fillna(0)
     return df_merged
 
@@ -60,4 +156,3 @@ if __name__ == "__main__":
     get_ticker_data(
         date(2024, 1, 1),
         date(2024, 12, 31))
-
@@ -1,5 +1,9 @@
-from datetime import date, datetime, timedelta
-from pandas import DataFrame, read_csv
+from datetime import date, datetime
+from pandas import DataFrame, read_csv, to_datetime, period_range
+import locale
+
+# Dutch month names, every stage sets its own locale because the stages can run in their own processes
+locale.setlocale(locale.LC_TIME, 'nl_NL.UTF-8')
 
 
 def get_month(datum:date):
@@ -13,35 +17,18 @@ class DegiroTransactions():
         self.start_datum = datetime.strptime(self.cash_report.tail(1).iloc[0]["Datum"], "%d-%m-%Y")
 
     def process_transactions(self):
-        aankopen = []
-        transacties = {}
-        for _, row in self.cash_report.iterrows():
-            maand = get_month(datetime.strptime(row["Datum"], "%d-%m-%Y"))
-
-            if not maand in transacties:
-                transacties[maand] = {"Koop": 0, "Verkoop": 0}
-
-            type_transactie = "Koop" if row["Aantal"] > 0 else "Verkoop"
-            transacties[maand][type_transactie] += abs(row["Waarde"])
-
-        datum = self.start_datum - timedelta(1)
-        while datum < datetime.now() - timedelta(1):
-            datum += timedelta(1)
-            
-            maand = get_month(datum)
-            if maand in [(aankoop[0], aankoop[1]) for aankoop in aankopen]:
-                continue
-            
-            if maand in transacties:
-                aankopen.append([
-                    *maand, 
-                    round(transacties[maand]["Koop"], 2), 
-                    round(transacties[maand]["Verkoop"], 2), 
-                    round(transacties[maand]["Koop"] - transacties[maand]["Verkoop"], 2)])
-                continue
-            aankopen.append([*maand, 0, 0, 0])
-
-        aankopen_df = DataFrame(data=aankopen, columns=["Jaar", "Maand", "Koop", "Verkoop", "Netto"])
+        # Total bought and sold per month, split by the sign of 'Aantal'
+        maanden = to_datetime(self.cash_report["Datum"], format="%d-%m-%Y").dt.to_period("M")
+        soort = self.cash_report["Aantal"].gt(0).map({True: "Koop", False: "Verkoop"})
+        transacties = self.cash_report["Waarde"].abs().groupby([maanden, soort]).sum().unstack()
+
+        # Every month from the first transaction up to today, also the months without transactions
+        alle_maanden = period_range(self.start_datum, datetime.now(), freq="M")
+        transacties = transacties.reindex(index=alle_maanden, columns=["Koop", "Verkoop"]).fillna(0)
+
+        aankopen_df = DataFrame(data=[get_month(maand.to_timestamp()) for maand in alle_maanden], columns=["Jaar", "Maand"])
+        aankopen_df["Koop"] = transacties["Koop"].round(2).values
+        aankopen_df["Verkoop"] = transacties["Verkoop"].round(2).values
+        aankopen_df["Netto"] = (transacties["Koop"] - transacties["Verkoop"]).round(2).values
         aankopen_df.to_csv("Degiro - Transacties.csv", sep=";", decimal=",", index=False)
         print("Verslag 'Degiro - Transacties' opgeslagen!")
-
@@ -1,9 +1,10 @@
 import pandas as pd
-from dataclasses import dataclass
-from datetime import date, datetime, timedelta
+
+from returns import compound, yearly_returns
 
 
 ADD_CASH = False
+CASH_COLUMNS = ["CASH & CASH FUND & FTX CASH (EUR)", "CASH & CASH FUND & FTX CASH (USD)"]
 
 class DegiroYield():
     def __init__(self) -> None:
@@ -16,52 +17,40 @@ class DegiroYield():
         # dataframe["date"] = dataframe.apply(lambda x: pd.to_datetime(datetime.strptime(x["Datum"], "%d-%m-%Y").date()), axis=1)
         # dataframe.set_index("date", inplace=True)
         # return dataframe.drop("Datum", axis="columns")
-        return dataframe.set_index("Datum")
-
-    def get_start_date(self):
-        cash_report_start = datetime.strptime(self.cash_report.tail(1).iloc[0]["Datum"], "%d-%m-%Y")
-        transaction_report_start = datetime.strptime(self.transactions_report.tail(1).iloc[0]["Datum"], "%d-%m-%Y")
-        return min(cash_report_start, transaction_report_start)
-    
-    def get_yield1(self):
-        date = self.get_start_date()
-        while date < datetime.now() - timedelta(1):
-            pass
-    
-    def get_yield(self, start, end):
-        tracked_value = 1
-
-        date = start
-        while date <= end:
-            date_formatted = date.strftime("%d-%m-%Y")
-
-            if date_formatted not in self.profit.index:
-                break
-
-            waarde = self.profit.loc[date_formatted]["Waarde"]
-            change = self.profit.loc[date_formatted]["Dagelijks rendement"]
-            cash = self.value.loc[date_formatted][["CASH & CASH FUND & FTX CASH (EUR)", "CASH & CASH FUND & FTX CASH (USD)"]].sum()
+        dataframe.index = pd.to_datetime(dataframe["Datum"], format="%d-%m-%Y").rename(None)
+        return dataframe.drop("Datum", axis="columns")
 
-            profit = change / (waarde - change - cash)
+    def get_daily_returns(self):
+        # Return of every day on the invested value, without the cash
+        waarde = self.profit["Waarde"]
+        change = self.profit["Dagelijks rendement"]
+        cash = self.value[CASH_COLUMNS].sum(axis=1)
+        return change / (waarde - change - cash)
 
-            tracked_value = tracked_value * (1 + profit)
-
-
-            date += timedelta(1)
+    def get_yield(self, start, end):
+        returns = self.get_daily_returns().loc[pd.Timestamp(start):pd.Timestamp(end)]
+        tracked_value = compound(returns).iloc[-1] if len(returns) > 0 else 1
 
         result = round(tracked_value * 100 - 100, 2)
         print(f"{start.year}: {result} %")
         return result
 
+    def get_yields(self):
+        # Yield of every year at once, and of the whole period. Days without a return are skipped in both
+        returns = self.get_daily_returns().dropna()
+        results = (yearly_returns(returns) * 100 - 100).round(2)
+        for year, result in results.items():
+            print(f"{year}: {result} %")
+
+        tracked_value = compound(returns).iloc[-1] if len(returns) > 0 else 1
+        total = round(tracked_value * 100 - 100, 2)
+        print(f"Totaal: {total} %")
+        return results, total
+
 
 if __name__ == "__main__":
     degiro = DegiroYield()
-    degiro.get_yield(date(2020, 1, 9), date(2020, 12, 31))
-    degiro.get_yield(date(2021, 1, 1), date(2021, 12, 31))
-    degiro.get_yield(date(2022, 1, 1), date(2022, 12, 31))
-    degiro.get_yield(date(2023, 1, 1), date(2023, 12, 31))
-    degiro.get_yield(date(2024, 1, 1), date(2024, 12, 31))
-    degiro.get_yield(date(2025, 1, 1), date(2025, 12, 31))
+    degiro.get_yields()
 
     # degiro.get_yield(date(2020, 1, 9), date(2024, 2, 14))
     # degiro.get_yield(date(2023, 3, 22), date(2024, 3, 22))